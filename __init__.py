@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from . import controllers
 from . import models
 from . import wizards
 from .hooks import post_init_hook
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Project Product Planning & Costing Management',
-    'version': '17.0.3.3.0',
+    'version': '17.0.3.5.0',
     'category': 'Project',
     'summary': 'Manage projects, product costing, and material planning with enhanced work order operations',
     'description': """
@@ -34,12 +34,19 @@
         
         # Stage 2: Data and Views
         'data/sequence_data.xml',
+        'data/mrp_run_cron.xml',
+        'data/planning_job_cron.xml',
+        'data/work_order_execution_cron.xml',
         'views/project_definition_views.xml',
         'views/project_product_pricing_views.xml',
         'views/material_production_planning_views.xml',
         'views/work_order_execution_views.xml',
         'views/production_report_views.xml',
         'views/component_specification_views.xml',
+        'views/bom_explosion_cache_views.xml',
+        'views/mrp_production_views.xml',
+        'views/mrp_workcenter_views.xml',
+        'views/planning_job_views.xml',
         'views/excel_import_manager_views.xml',
         'views/import_wizard_views.xml',
         'views/import_separate_wizards_views.xml',
@@ -50,6 +57,7 @@
         
         # Stage 3: Secondary and Wizard security (loaded after views)
         'security/ir.model.access.secondary.csv',
+        'security/planning_job_security.xml',
         'security/ir.model.access.wizard.csv',
     ],
     'demo': [],
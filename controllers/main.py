@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+from odoo import http, _
+from odoo.exceptions import AccessError, MissingError
+from odoo.http import request
+
+EXECUTION_FIELDS = [
+    'state', 'total_components', 'completed_components', 'in_progress_components', 'write_date',
+]
+LINE_FIELDS = [
+    'sequence', 'component_id', 'quantity', 'production_id', 'production_state',
+    'current_operation', 'done_count', 'total_count', 'progress_percentage', 'write_date',
+]
+OPERATION_FIELDS = [
+    'execution_line_id', 'sequence', 'name', 'workcenter_id', 'state',
+    'qty_production', 'qty_produced', 'progress_percentage',
+    'actual_duration', 'workers_assigned', 'machines_assigned',
+    'date_start', 'date_finished', 'write_date',
+]
+
+
+class WorkOrderExecutionController(http.Controller):
+
+    @http.route('/project_product_costing/execution/<int:execution_id>/changes',
+                type='http', auth='user', methods=['GET'])
+    def execution_changes(self, execution_id, since=None, **kwargs):
+        """Execution and operation lines changed since the ``since`` watermark.
+
+        Rows carry the id of the last transaction writing them
+        (``change_txid``). The returned ``watermark`` is capped at the oldest
+        transaction still running, so rows it commits later are returned by
+        the next poll; rows may come twice, clients merge them by id.
+
+        The response also holds the ids of all the execution lines and
+        operation lines, to drop the deleted ones. An unchanged response
+        answers 304 to a matching ``If-None-Match``.
+        """
+        try:
+            execution = request.env['work.order.execution'].browse(execution_id)
+            execution.check_access_rights('read')
+            execution.check_access_rule('read')
+        except (AccessError, MissingError):
+            return request.make_json_response({'error': _('Execution not found')}, status=404)
+
+        try:
+            since = int(since) if since else 0
+        except ValueError:
+            return request.make_json_response({'error': _('Invalid watermark: %s') % since}, status=400)
+
+        # One pass over the (execution_id, change_txid) indexes, in the same
+        # snapshot as the oldest running transaction
+        request.env.cr.execute("""
+            SELECT txid_snapshot_xmin(txid_current_snapshot()),
+                   (SELECT MAX(change_txid) FROM work_order_execution_line WHERE execution_id = %(id)s),
+                   (SELECT MAX(change_txid) FROM work_order_operation_line WHERE execution_id = %(id)s),
+                   (SELECT ARRAY_AGG(id ORDER BY id) FROM work_order_operation_line WHERE execution_id = %(id)s),
+                   (SELECT ARRAY_AGG(id ORDER BY id) FROM work_order_execution_line WHERE execution_id = %(id)s),
+                   change_txid
+              FROM work_order_execution
+             WHERE id = %(id)s
+        """, {'id': execution.id})
+        row = request.env.cr.fetchone()
+        if not row:
+            return request.make_json_response({'error': _('Execution not found')}, status=404)
+        xmin, line_txid, operation_txid, operation_ids, line_ids, execution_txid = row
+        line_ids = line_ids or []
+        operation_ids = operation_ids or []
+        last_change = max(txid for txid in (line_txid, operation_txid, execution_txid) if txid)
+        # Transactions before xmin are over, none of them can commit a row
+        # after the last change: the watermark only moves on changes
+        watermark = min(xmin, last_change + 1)
+
+        etag = hashlib.sha1(('%s|%s|%s|%s|%s|%s' % (
+            execution.id, since, watermark, last_change, operation_ids, line_ids,
+        )).encode()).hexdigest()
+        if request.httprequest.if_none_match.contains(etag):
+            return request.make_response('', headers=[('ETag', '"%s"' % etag)], status=304)
+
+        changed = last_change >= since
+        lines = operations = []
+        if changed:
+            request.env.cr.execute("""
+                SELECT id FROM work_order_execution_line WHERE execution_id = %(id)s AND change_txid >= %(since)s
+                 ORDER BY sequence, id
+            """, {'id': execution.id, 'since': since})
+            lines = request.env['work.order.execution.line'].browse(
+                [line_id for line_id, in request.env.cr.fetchall()]
+            ).read(LINE_FIELDS)
+            request.env.cr.execute("""
+                SELECT id FROM work_order_operation_line WHERE execution_id = %(id)s AND change_txid >= %(since)s
+                 ORDER BY sequence, id
+            """, {'id': execution.id, 'since': since})
+            operations = request.env['work.order.operation.line'].browse(
+                [operation_id for operation_id, in request.env.cr.fetchall()]
+            ).read(OPERATION_FIELDS)
+        payload = {
+            'watermark': watermark,
+            'execution': execution.read(EXECUTION_FIELDS)[0] if changed else False,
+            'line_ids': line_ids,
+            'operation_ids': operation_ids,
+            'lines': lines,
+            'operations': operations,
+        }
+        return request.make_json_response(payload, headers=[
+            ('ETag', '"%s"' % etag),
+            ('Cache-Control', 'no-cache'),
+        ])
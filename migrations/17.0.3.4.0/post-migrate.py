@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Backfill the planning and project links of manufacturing and purchase orders"""
+    
+    # Productions linked to their planning
+    cr.execute("""
+        UPDATE mrp_production mp
+           SET planning_id = rel.planning_id
+          FROM material_planning_production_rel rel
+         WHERE rel.production_id = mp.id
+           AND mp.planning_id IS NULL
+    """)
+    _logger.info('Linked %s manufacturing orders to their planning', cr.rowcount)
+    
+    # Productions created from a planning before the link existed: the origin
+    # is the planning reference, followed by the component for sub-assemblies
+    cr.execute("""
+        UPDATE mrp_production mp
+           SET planning_id = mpp.id
+          FROM material_production_planning mpp
+         WHERE mp.planning_id IS NULL
+           AND (mp.origin = mpp.name OR mp.origin LIKE mpp.name || ' - %')
+    """)
+    _logger.info('Linked %s manufacturing orders to their planning by origin', cr.rowcount)
+    
+    # RFQs linked to their planning
+    cr.execute("""
+        UPDATE purchase_order po
+           SET planning_id = rel.material_production_planning_id
+          FROM material_production_planning_purchase_order_rel rel
+         WHERE rel.purchase_order_id = po.id
+           AND po.planning_id IS NULL
+    """)
+    cr.execute("""
+        UPDATE purchase_order po
+           SET planning_id = mpp.id
+          FROM material_production_planning mpp
+         WHERE po.planning_id IS NULL
+           AND po.origin = mpp.name
+    """)
+    
+    # Only orders linked to a planning get its project; other orders are left
+    # without one rather than guessed from their origin
+    for table in ('mrp_production', 'purchase_order'):
+        cr.execute("""
+            UPDATE {table} rec
+               SET project_definition_id = mpp.project_id
+              FROM material_production_planning mpp
+             WHERE mpp.id = rec.planning_id
+               AND rec.project_definition_id IS NULL
+        """.format(table=table))
+        _logger.info('Linked %s %s records to their project', cr.rowcount, table)
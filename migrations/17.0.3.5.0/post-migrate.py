@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Point the operation lines at their pricing component and drop the
+    specification copies they used to store"""
+    
+    cr.execute("SELECT to_regclass('operation_specification_rel')")
+    if cr.fetchone()[0]:
+        # The copied specifications all belong to the pricing component the
+        # operation was loaded from
+        cr.execute("""
+            UPDATE work_order_operation_line op
+               SET pricing_component_id = spec.pricing_component_id
+              FROM (
+                    SELECT DISTINCT ON (rel.operation_id) rel.operation_id, v.pricing_component_id
+                      FROM operation_specification_rel rel
+                      JOIN component_specification_value v ON v.id = rel.specification_id
+                     WHERE v.pricing_component_id IS NOT NULL
+                  ORDER BY rel.operation_id, v.id
+                   ) spec
+             WHERE spec.operation_id = op.id
+               AND op.pricing_component_id IS NULL
+        """)
+        _logger.info('Linked %s operation lines to their pricing component', cr.rowcount)
+        cr.execute("DROP TABLE operation_specification_rel")
+    
+    # Now related to the pricing component
+    cr.execute("""
+        ALTER TABLE work_order_operation_line
+            DROP COLUMN IF EXISTS additional_code,
+            DROP COLUMN IF EXISTS specification_text
+    """)
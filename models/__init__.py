@@ -2,7 +2,18 @@
 
 from . import project_definition
 from . import project_product_pricing
+from . import uom_uom
+from . import product_template
+from . import mrp_workcenter
+from . import mrp_bom
+from . import bom_explosion
+from . import bom_explosion_cache
+from . import stock_availability
+from . import planning_job
 from . import material_production_planning
+from . import mrp_production
+from . import mrp_workorder
+from . import purchase_order
 from . import component_specifications
 from . import work_order_execution
 from . import production_reports
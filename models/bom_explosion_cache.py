@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+from psycopg2 import IntegrityError, errors
+
+from odoo import models, fields, api, _
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Bumped whenever the meaning of the cached quantities changes
+CACHE_VERSION = 2
+
+
+class MrpBomExplosionCache(models.Model):
+    """Flattened leaf materials of a BOM, shared by every explosion.
+
+    A cache entry is valid as long as its signature (built from the
+    ``write_date`` of the BOM and of its lines) matches. Changes to the
+    sub-assemblies are caught by :meth:`_invalidate_boms`, called from the
+    ``mrp.bom`` / ``mrp.bom.line`` write hooks, which follows
+    ``dependency_ids`` up to every BOM using the changed one.
+    """
+    _name = 'mrp.bom.explosion.cache'
+    _description = 'BOM Explosion Cache'
+    _order = 'hit_count desc, id'
+    _rec_name = 'bom_id'
+
+    bom_id = fields.Many2one(
+        'mrp.bom',
+        string='Bill of Materials',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        default=lambda self: self.env.company,
+        help='Company used to find the sub-assembly BOMs'
+    )
+    signature = fields.Char(
+        string='Signature',
+        readonly=True,
+        help='Cache version, latest write date and line count of the BOM'
+    )
+    dependency_ids = fields.Many2many(
+        'mrp.bom',
+        'mrp_bom_explosion_cache_dependency_rel',
+        'cache_id',
+        'bom_id',
+        string='Exploded BOMs',
+        help='The BOM and its direct sub-assembly BOMs'
+    )
+    line_ids = fields.One2many(
+        'mrp.bom.explosion.cache.line',
+        'cache_id',
+        string='Leaf Materials'
+    )
+    line_count = fields.Integer(
+        string='Leaf Materials',
+        compute='_compute_line_count'
+    )
+    hit_count = fields.Integer(
+        string='Hits',
+        readonly=True,
+        default=0,
+        help='Hits counted up to the last daily cleanup'
+    )
+    miss_count = fields.Integer(string='Misses', readonly=True, default=1)
+
+    _sql_constraints = [
+        ('bom_company_uniq', 'unique(bom_id, company_id)', 'A BOM can only be cached once per company!'),
+    ]
+
+    @api.depends('line_ids')
+    def _compute_line_count(self):
+        for record in self:
+            record.line_count = len(record.line_ids)
+
+    @api.model
+    def _get_signatures(self, bom_ids):
+        """Return ``{bom_id: signature}`` for ``bom_ids`` in one query"""
+        self.env['mrp.bom'].flush_model(['write_date'])
+        self.env['mrp.bom.line'].flush_model(['bom_id', 'write_date'])
+        self.env.cr.execute("""
+            SELECT b.id, GREATEST(b.write_date, MAX(l.write_date)), COUNT(l.id)
+              FROM mrp_bom b
+         LEFT JOIN mrp_bom_line l ON l.bom_id = b.id
+             WHERE b.id = ANY(%s)
+          GROUP BY b.id
+        """, [list(bom_ids)])
+        return {
+            bom_id: '%s|%s|%s' % (CACHE_VERSION, write_date, line_count)
+            for bom_id, write_date, line_count in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _lookup(self, bom_ids):
+        """Return the valid cached explosions of ``bom_ids``.
+
+        The cache rows are not written: each hit is inserted in
+        ``mrp.bom.explosion.cache.hit`` and added to the rows by
+        :meth:`_gc_write_hit_counts`.
+
+        :return: dict ``{bom_id: {material_id: (qty per unit, lead days)}}``
+        """
+        if not bom_ids:
+            return {}
+        signatures = self._get_signatures(bom_ids)
+        caches = self.search_fetch([
+            ('bom_id', 'in', list(bom_ids)),
+            ('company_id', '=', self.env.company.id),
+        ], ['bom_id', 'signature'])
+        valid = caches.filtered(lambda c: c.signature == signatures.get(c.bom_id.id))
+        if not valid:
+            return {}
+
+        result = {cache.bom_id.id: {} for cache in valid}
+        lines = self.env['mrp.bom.explosion.cache.line'].search_fetch(
+            [('cache_id', 'in', valid.ids)],
+            ['bom_id', 'product_id', 'quantity', 'lead_days'],
+        )
+        for line in lines:
+            result[line.bom_id.id][line.product_id.id] = (line.quantity, line.lead_days)
+
+        # Lookups run on read-only paths and must not lock the cache rows
+        # shared by every planner: hits are only inserted, one row each
+        self.env.cr.execute("""
+            INSERT INTO mrp_bom_explosion_cache_hit (cache_id) SELECT unnest(%s::int[])
+        """, [valid.ids])
+        return result
+
+    @api.autovacuum
+    def _gc_write_hit_counts(self):
+        """Add the hits recorded since the last run to the cache rows, once a day"""
+        self.env.cr.execute("""
+            WITH hits AS (
+                DELETE FROM mrp_bom_explosion_cache_hit RETURNING cache_id
+            )
+            UPDATE mrp_bom_explosion_cache c
+               SET hit_count = c.hit_count + h.hits
+              FROM (SELECT cache_id, COUNT(*) AS hits FROM hits GROUP BY cache_id) h
+             WHERE c.id = h.cache_id
+        """)
+        self.invalidate_model(['hit_count'])
+
+    @api.model
+    def _store(self, explosions, dependencies):
+        """Store freshly exploded BOMs.
+
+        :param explosions: dict ``{bom_id: {material_id: (qty, lead days)}}``
+        :param dependencies: dict ``{bom_id: set of exploded BOM ids}``
+        """
+        if not explosions:
+            return
+        signatures = self._get_signatures(explosions)
+        existing = {
+            cache.bom_id.id: cache
+            for cache in self.search([
+                ('bom_id', 'in', list(explosions)),
+                ('company_id', '=', self.env.company.id),
+            ])
+        }
+        to_create = []
+        try:
+            with self.env.cr.savepoint():
+                for bom_id, leaves in explosions.items():
+                    cache = existing.get(bom_id)
+                    if cache and cache.signature == signatures.get(bom_id):
+                        continue
+                    vals = {
+                        'signature': signatures.get(bom_id),
+                        'dependency_ids': [(6, 0, list(dependencies.get(bom_id, {bom_id})))],
+                        'line_ids': [(0, 0, {
+                            'product_id': material_id,
+                            'quantity': qty,
+                            'lead_days': lead_days,
+                        }) for material_id, (qty, lead_days) in leaves.items()],
+                    }
+                    if cache:
+                        vals['line_ids'].insert(0, (5, 0, 0))
+                        vals['miss_count'] = cache.miss_count + 1
+                        cache.write(vals)
+                    else:
+                        vals.update(bom_id=bom_id, company_id=self.env.company.id)
+                        to_create.append(vals)
+                if to_create:
+                    self.create(to_create)
+        except (IntegrityError, errors.SerializationFailure) as e:
+            # Another transaction cached the same BOMs concurrently; the
+            # explosion result is still valid, only the cache write is lost
+            _logger.info('Could not store BOM explosion cache: %s', e)
+
+    @api.model
+    def _invalidate_boms(self, bom_ids):
+        """Drop the cached explosions that went through any of ``bom_ids``"""
+        Cache = self.sudo()
+        seen = set()
+        bom_ids = set(bom_ids)
+        while bom_ids:
+            seen |= bom_ids
+            caches = Cache.search([('dependency_ids', 'in', list(bom_ids))])
+            # Parents of a dropped BOM are stale as well
+            bom_ids = set(caches.bom_id.ids) - seen
+            caches.unlink()
+
+    @api.model
+    def _get_cache_statistics(self):
+        """Return the number of cached BOMs and the total hits and misses"""
+        self.flush_model(['hit_count', 'miss_count'])
+        # Hits not added to the rows yet are counted from their own table
+        self.env.cr.execute("""
+            SELECT COUNT(*), COALESCE(SUM(hit_count), 0), COALESCE(SUM(miss_count), 0),
+                   (SELECT COUNT(*) FROM mrp_bom_explosion_cache_hit)
+              FROM mrp_bom_explosion_cache
+        """)
+        entries, hits, misses, pending_hits = self.env.cr.fetchone()
+        hits += pending_hits
+        return {'entries': entries, 'hits': hits, 'misses': misses}
+
+    @api.model
+    def action_clear_cache(self):
+        self.sudo().search([]).unlink()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Success'),
+                'message': _('BOM explosion cache cleared!'),
+                'type': 'success',
+                'sticky': False,
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
+
+
+class MrpBomExplosionCacheHit(models.Model):
+    """One hit of a cache entry, inserted by :meth:`MrpBomExplosionCache._lookup`
+    and aggregated into its ``hit_count`` by the autovacuum.
+    """
+    _name = 'mrp.bom.explosion.cache.hit'
+    _description = 'BOM Explosion Cache Hit'
+    _log_access = False
+
+    cache_id = fields.Many2one(
+        'mrp.bom.explosion.cache',
+        string='Cache',
+        required=True,
+        ondelete='cascade'
+    )
+
+
+class MrpBomExplosionCacheLine(models.Model):
+    _name = 'mrp.bom.explosion.cache.line'
+    _description = 'BOM Explosion Cache Line'
+
+    cache_id = fields.Many2one(
+        'mrp.bom.explosion.cache',
+        string='Cache',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+    bom_id = fields.Many2one(
+        'mrp.bom',
+        string='Bill of Materials',
+        related='cache_id.bom_id',
+        store=True,
+        index=True
+    )
+    product_id = fields.Many2one(
+        'product.product',
+        string='Material',
+        required=True
+    )
+    quantity = fields.Float(string='Quantity per Unit')
+    lead_days = fields.Integer(
+        string='Lead Time (Days)',
+        help='Manufacturing lead time between the material need and the BOM product'
+    )
@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
 
+from array import array
+from datetime import timedelta
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import float_compare
+import logging
+
+_logger = logging.getLogger(__name__)
 
 
 class MaterialProductionPlanning(models.Model):
@@ -114,6 +121,13 @@ class MaterialProductionPlanning(models.Model):
         default=lambda self: self.env.company
     )
     
+    warehouse_id = fields.Many2one(
+        'stock.warehouse',
+        string='Warehouse',
+        help='Only count stock of this warehouse for material availability. '
+             'Leave empty to use all internal locations.'
+    )
+    
     notes = fields.Text(string='Notes')
     
     @api.model
@@ -187,83 +201,577 @@ class MaterialProductionPlanning(models.Model):
         if not self.pricing_id:
             raise UserError(_('Please select a pricing reference first!'))
         
-        # Clear existing components
-        self.component_line_ids.unlink()
-        
-        # Load components from pricing
-        component_lines = []
-        for comp in self.pricing_id.component_line_ids:
-            component_lines.append((0, 0, {
-                'component_id': comp.component_id.id,
-                'quantity': comp.quantity,
-                'weight': comp.weight,
-                'cost_price': comp.cost_price,
-                'bom_id': comp.bom_id.id if comp.bom_id else False,
-            }))
-        
-        self.write({
-            'component_line_ids': component_lines,
-            'state': 'components_loaded'
-        })
+        # Load components from pricing, keeping the lines that did not change
+        stats = self._bulk_load_components()
+        self.state = 'components_loaded'
         
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
                 'title': _('Success'),
-                'message': _('Components loaded successfully!'),
+                'message': _('Components loaded successfully!\n%s') % self._format_sync_stats(stats),
                 'type': 'success',
                 'sticky': False,
             }
         }
     
-    def action_material_planning(self):
+    def _bulk_load_components(self):
+        """Synchronise the component lines with the pricing in set-based statements.
+        
+        Components are matched on their pricing line: changed lines are
+        updated, new ones inserted with ``INSERT ... SELECT`` and the others
+        deleted. Specification values are copied to every component line that
+        has none yet, then ``additional_code`` is recomputed once for them.
+        
+        :return: dict with the number of ``created``, ``updated``, ``deleted``
+            and ``unchanged`` lines
+        """
         self.ensure_one()
-        if not self.component_line_ids:
-            raise UserError(_('Please load components first!'))
+        Component = self.env['material.planning.component']
+        SpecValue = self.env['component.specification.value']
+        self.env['project.product.component'].flush_model()
+        Component.flush_model()
+        SpecValue.flush_model()
+        cr = self.env.cr
+        params = {'planning_id': self.id, 'pricing_id': self.pricing_id.id, 'uid': self.env.uid}
+        
+        # Lines no longer in the pricing, and duplicates of the same pricing line
+        cr.execute("""
+            SELECT mpc.id
+              FROM material_planning_component mpc
+         LEFT JOIN project_product_component ppc
+                ON ppc.id = mpc.pricing_component_id AND ppc.pricing_id = %(pricing_id)s
+             WHERE mpc.planning_id = %(planning_id)s
+               AND (ppc.id IS NULL OR mpc.id != (
+                    SELECT MIN(dup.id) FROM material_planning_component dup
+                     WHERE dup.planning_id = mpc.planning_id
+                       AND dup.pricing_component_id = mpc.pricing_component_id))
+        """, params)
+        obsolete = Component.browse([row[0] for row in cr.fetchall()])
+        obsolete.unlink()
+        
+        cr.execute("""
+            UPDATE material_planning_component mpc
+               SET sequence = ppc.sequence,
+                   component_id = ppc.component_id,
+                   quantity = ppc.quantity,
+                   weight = ppc.weight,
+                   cost_price = ppc.cost_price,
+                   bom_id = ppc.bom_id,
+                   write_uid = %(uid)s,
+                   write_date = NOW() AT TIME ZONE 'UTC'
+              FROM project_product_component ppc
+             WHERE ppc.id = mpc.pricing_component_id
+               AND mpc.planning_id = %(planning_id)s
+               AND (mpc.sequence, mpc.component_id, mpc.quantity, mpc.weight, mpc.cost_price, mpc.bom_id)
+                   IS DISTINCT FROM
+                   (ppc.sequence, ppc.component_id, ppc.quantity, ppc.weight, ppc.cost_price, ppc.bom_id)
+         RETURNING mpc.id
+        """, params)
+        updated = Component.browse([row[0] for row in cr.fetchall()])
+        
+        cr.execute("""
+            INSERT INTO material_planning_component
+                   (planning_id, pricing_component_id, sequence, component_id, quantity,
+                    weight, cost_price, bom_id, create_uid, create_date, write_uid, write_date)
+            SELECT %(planning_id)s, ppc.id, ppc.sequence, ppc.component_id, ppc.quantity,
+                   ppc.weight, ppc.cost_price, ppc.bom_id,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM project_product_component ppc
+             WHERE ppc.pricing_id = %(pricing_id)s
+               AND NOT EXISTS (
+                    SELECT 1 FROM material_planning_component mpc
+                     WHERE mpc.planning_id = %(planning_id)s
+                       AND mpc.pricing_component_id = ppc.id)
+          ORDER BY ppc.sequence, ppc.id
+         RETURNING id
+        """, params)
+        created = Component.browse([row[0] for row in cr.fetchall()])
+        
+        # Specification values of the pricing lines, for component lines without any
+        cr.execute("""
+            INSERT INTO component_specification_value
+                   (planning_component_id, sequence, specification_id, specification_name,
+                    value, notes, create_uid, create_date, write_uid, write_date)
+            SELECT mpc.id, csv.sequence, csv.specification_id, csv.specification_name,
+                   csv.value, csv.notes,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM material_planning_component mpc
+              JOIN component_specification_value csv ON csv.pricing_component_id = mpc.pricing_component_id
+             WHERE mpc.planning_id = %(planning_id)s
+               AND NOT EXISTS (
+                    SELECT 1 FROM component_specification_value own
+                     WHERE own.planning_component_id = mpc.id)
+         RETURNING planning_component_id
+        """, params)
+        specified = Component.browse({row[0] for row in cr.fetchall()})
+        
+        # The statements above bypassed the ORM: refresh the cache and recompute
+        self.invalidate_recordset(['component_line_ids'])
+        Component.invalidate_model()
+        SpecValue.invalidate_model()
+        updated.modified(['sequence', 'component_id', 'quantity', 'weight', 'cost_price', 'bom_id'])
+        created.modified(['planning_id'])
+        if specified:
+            self.env.add_to_compute(Component._fields['additional_code'], specified)
+            specified.flush_recordset(['additional_code'])
+        
+        return {
+            'created': len(created),
+            'updated': len(updated),
+            'deleted': len(obsolete),
+            'unchanged': len(self.component_line_ids) - len(created) - len(updated),
+        }
+    
+    def _diff_lines(self, lines, vals_list, key_fields, compare_fields):
+        """Write the changed lines and return what is left to create and delete.
+        
+        :return: tuple ``(to_create, obsolete, stats)``
+        """
+        to_create, to_write, obsolete, unchanged = self._match_lines(
+            lines, vals_list, key_fields, compare_fields
+        )
+        for line, changes in to_write:
+            line.write(changes)
+        
+        stats = {
+            'created': len(to_create),
+            'updated': len(to_write),
+            'deleted': len(obsolete),
+            'unchanged': unchanged,
+        }
+        return to_create, obsolete, stats
+    
+    def _match_lines(self, lines, vals_list, key_fields, compare_fields):
+        """Match ``vals_list`` against ``lines`` without writing anything.
+        
+        :return: tuple ``(to_create, to_write, obsolete, unchanged)`` where
+            ``to_write`` is a list of ``(line, changed values)``
+        """
+        existing = {}
+        obsolete = lines.browse()
+        for line in lines:
+            key = tuple(line[fname].id for fname in key_fields)
+            if key in existing:
+                obsolete |= line
+            else:
+                existing[key] = line
+        
+        to_create = []
+        to_write = []
+        unchanged = 0
+        for vals in vals_list:
+            key = tuple(vals.get(fname) or False for fname in key_fields)
+            line = existing.pop(key, None)
+            if not line:
+                to_create.append(vals)
+                continue
+            changes = {
+                fname: vals[fname]
+                for fname in compare_fields
+                if fname in vals and self._line_value_changed(line, fname, vals[fname])
+            }
+            if changes:
+                to_write.append((line, changes))
+            else:
+                unchanged += 1
+        
+        for line in existing.values():
+            obsolete |= line
+        return to_create, to_write, obsolete, unchanged
+    
+    @api.model
+    def _line_value_changed(self, line, fname, value):
+        field = line._fields[fname]
+        if field.type == 'float':
+            digits = field.get_digits(self.env)
+            precision = digits[1] if digits else 6
+            return float_compare(line[fname], value or 0.0, precision_digits=precision) != 0
+        if field.type == 'many2one':
+            return line[fname].id != (value or False)
+        return line[fname] != value
+    
+    @api.model
+    def _format_sync_stats(self, stats):
+        return _('%(created)s created, %(updated)s updated, %(deleted)s deleted, '
+                 '%(unchanged)s unchanged') % stats
+    
+    def _get_material_requirement_vals(self, explosion_memo=None, uom_factors=None, quantity=None):
+        """Gross leaf requirements of the planning, one dict per component and material.
+        
+        Component BOMs are exploded through every sub-assembly level, so only
+        raw materials (products without a BOM) end up as requirements.
+        
+        Requirements are time-phased backwards from the project end date: the
+        need date is offset by the manufacturing lead times of the BOM levels
+        between the component and the material, and the order date further
+        by the lead time of the material's main vendor.
+        
+        Quantities are in the stock unit of measure of each material, the
+        component quantity being in the stock unit of the component.
         
-        # Calculate material requirements
-        self.material_requirement_ids.unlink()
+        :param quantity: optional product quantity to plan instead of the
+            planning's, component quantities are scaled accordingly
+        """
+        self.ensure_one()
+        ratio = quantity / self.quantity if quantity is not None and self.quantity else 1.0
+        explosion = self.env['material.bom.explosion']._explode_boms(
+            self.component_line_ids.bom_id.ids, memo=explosion_memo, uom_factors=uom_factors
+        )
+        due_date = self.project_id.end_date or fields.Date.context_today(self)
         
-        material_lines = []
+        requirements = {}
         for comp in self.component_line_ids:
             if comp.bom_id:
-                # Get raw materials from BOM
-                for bom_line in comp.bom_id.bom_line_ids:
-                    required_qty = bom_line.product_qty * comp.quantity
-                    
-                    # Get available stock
-                    product = bom_line.product_id
-                    available_qty = product.qty_available - product.outgoing_qty
-                    
-                    shortage_qty = max(0, required_qty - available_qty)
-                    
-                    material_lines.append((0, 0, {
-                        'component_id': comp.component_id.id,
-                        'material_id': bom_line.product_id.id,
-                        'required_qty': required_qty,
-                        'available_qty': available_qty,
-                        'shortage_qty': shortage_qty,
-                    }))
+                leaves = explosion[comp.bom_id.id]
             else:
                 # Direct component without BOM
-                required_qty = comp.quantity
-                product = comp.component_id
-                available_qty = product.qty_available - product.outgoing_qty
-                shortage_qty = max(0, required_qty - available_qty)
-                
-                material_lines.append((0, 0, {
-                    'component_id': comp.component_id.id,
-                    'material_id': comp.component_id.id,
-                    'required_qty': required_qty,
-                    'available_qty': available_qty,
-                    'shortage_qty': shortage_qty,
-                }))
-        
-        self.write({
-            'material_requirement_ids': material_lines,
-            'state': 'material_planned'
+                leaves = {comp.component_id.id: (1.0, 0)}
+            for material_id, (qty_per_unit, lead_days) in leaves.items():
+                key = (comp.component_id.id, material_id)
+                need_date = due_date - timedelta(days=lead_days)
+                if key not in requirements:
+                    requirements[key] = {
+                        'component_id': comp.component_id.id,
+                        'material_id': material_id,
+                        'required_qty': 0.0,
+                        'need_date': need_date,
+                    }
+                requirements[key]['required_qty'] += qty_per_unit * comp.quantity * ratio
+                requirements[key]['need_date'] = min(requirements[key]['need_date'], need_date)
+        
+        materials = self.env['product.product'].browse({key[1] for key in requirements})
+        purchase_lead_days = {
+            material.id: material.seller_ids[:1].delay or 0 for material in materials
+        }
+        for vals in requirements.values():
+            vals['order_date'] = vals['need_date'] - timedelta(days=purchase_lead_days[vals['material_id']])
+        return list(requirements.values())
+    
+    @api.model
+    def _net_material_requirements(self, requirement_vals, free_qty):
+        """Allocate free stock across all components consuming the same material.
+        
+        Gross requirements are totalled per material first; materials fully
+        covered by stock are allocated in full, the others are allocated line
+        by line in component order until the stock runs out. ``free_qty`` maps
+        material ids to their free stock and is decreased by what is allocated,
+        so it can be shared between several plannings.
+        
+        :return: dict ``{material_id: {'required', 'available', 'shortage'}}``
+        """
+        summary = {}
+        for vals in requirement_vals:
+            material_id = vals['material_id']
+            if material_id not in summary:
+                summary[material_id] = {
+                    'required': 0.0,
+                    'available': max(free_qty.get(material_id, 0.0), 0.0),
+                    'shortage': 0.0,
+                }
+            summary[material_id]['required'] += vals['required_qty']
+        
+        for vals in requirement_vals:
+            material_id = vals['material_id']
+            totals = summary[material_id]
+            remaining = max(free_qty.get(material_id, 0.0), 0.0)
+            if totals['required'] <= totals['available']:
+                allocated = vals['required_qty']
+            else:
+                allocated = min(vals['required_qty'], remaining)
+            free_qty[material_id] = remaining - allocated
+            shortage = vals['required_qty'] - allocated
+            totals['shortage'] += shortage
+            vals.update({
+                'available_qty': totals['available'],
+                'allocated_qty': allocated,
+                'shortage_qty': shortage,
+            })
+        return summary
+    
+    @api.model
+    def _net_from_pools(self, requirement_vals, pools):
+        """Net ``requirement_vals`` against the total of several stock pools,
+        then take what was allocated out of the pools, in order.
+        
+        :param pools: list of dicts ``{material_id: free qty}``, decreased
+            like the ``free_qty`` of :meth:`_net_material_requirements`
+        """
+        material_ids = {vals['material_id'] for vals in requirement_vals}
+        free_qty = {
+            material_id: sum(max(pool.get(material_id, 0.0), 0.0) for pool in pools)
+            for material_id in material_ids
+        }
+        before = dict(free_qty)
+        summary = self._net_material_requirements(requirement_vals, free_qty)
+        for material_id in material_ids:
+            used = before[material_id] - max(free_qty[material_id], 0.0)
+            for pool in pools:
+                if used <= 0:
+                    break
+                taken = min(max(pool.get(material_id, 0.0), 0.0), used)
+                pool[material_id] = pool.get(material_id, 0.0) - taken
+                used -= taken
+        return summary
+    
+    def _compute_material_plan(self, quantities=None):
+        """Net material requirements of all plannings in ``self``, in memory.
+        
+        Plannings are exploded with a shared BOM memo, then allocated the free
+        stock of one snapshot in priority order (project end date, then
+        creation date). Plannings of a warehouse and plannings without one
+        share the same per-warehouse pools, so two plannings never claim the
+        same stock.
+        
+        :param quantities: optional dict ``{planning_id: product quantity}``
+            overriding the quantity of some plannings
+        :return: tuple ``(plannings, requirements)``, the plannings in priority
+            order and a dict ``{planning_id: list of requirement line values}``
+        """
+        quantities = quantities or {}
+        plannings = self.sorted(lambda p: (
+            p.project_id.end_date or fields.Date.to_date('9999-12-31'),
+            p.create_date or fields.Datetime.now(),
+            p.id,
+        ))
+        
+        explosion_memo = {}
+        uom_factors = self.env['uom.uom']._get_factor_table()
+        requirements = {}
+        for planning in plannings:
+            requirements[planning.id] = planning._get_material_requirement_vals(
+                explosion_memo, uom_factors, quantity=quantities.get(planning.id)
+            )
+        
+        # One shared pool of free stock per warehouse: plannings scoped to a
+        # warehouse draw from its pool, the others from all the pools, so no
+        # stock is ever claimed twice
+        material_ids = {
+            vals['material_id'] for requirement_vals in requirements.values() for vals in requirement_vals
+        }
+        Availability = self.env['material.stock.availability']
+        warehouses = plannings.warehouse_id
+        unscoped = any(not planning.warehouse_id for planning in plannings)
+        if unscoped:
+            warehouses |= self.env['stock.warehouse'].search([('company_id', 'in', self.env.companies.ids)])
+        pools = {}
+        for warehouse in warehouses.sorted('id'):
+            availability = Availability._get_availability(material_ids, location=warehouse.view_location_id)
+            pools[warehouse.id] = {material_id: qty['free'] for material_id, qty in availability.items()}
+        if unscoped:
+            # Internal stock outside every warehouse is only for the unscoped plannings
+            availability = Availability._get_availability(material_ids)
+            pools[False] = {
+                material_id: max(qty['free'] - sum(
+                    max(pool.get(material_id, 0.0), 0.0) for pool in pools.values()
+                ), 0.0)
+                for material_id, qty in availability.items()
+            }
+        
+        for planning in plannings:
+            requirement_vals = requirements[planning.id]
+            if planning.warehouse_id:
+                self._net_material_requirements(requirement_vals, pools[planning.warehouse_id.id])
+            else:
+                self._net_from_pools(requirement_vals, list(pools.values()))
+            for vals in requirement_vals:
+                vals['planning_id'] = planning.id
+        return plannings, requirements
+    
+    @api.model
+    def _get_requirement_compare_fields(self):
+        return [
+            'required_qty', 'available_qty', 'allocated_qty', 'shortage_qty',
+            'need_date', 'order_date',
+        ]
+    
+    def _run_material_planning(self):
+        """Plan the materials of all plannings in ``self`` against one stock snapshot.
+        
+        Requirements are netted by :meth:`_compute_material_plan`, then the
+        requirement lines of all the plannings are synchronised in bulk.
+        
+        :return: dict with the number of created, updated, deleted and
+            unchanged requirement lines
+        """
+        plannings, requirements = self._compute_material_plan()
+        
+        to_create = []
+        obsolete = self.env['material.requirement.line']
+        stats = {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        for planning in plannings:
+            # Only touch the requirement lines whose quantities changed
+            planning_create, planning_obsolete, planning_stats = self._diff_lines(
+                planning.material_requirement_ids,
+                requirements[planning.id],
+                key_fields=['component_id', 'material_id'],
+                compare_fields=self._get_requirement_compare_fields(),
+            )
+            to_create += planning_create
+            obsolete |= planning_obsolete
+            for key, count in planning_stats.items():
+                stats[key] += count
+        
+        obsolete.unlink()
+        if to_create:
+            self.env['material.requirement.line'].create(to_create)
+        plannings.filtered(lambda p: p.state != 'material_planned').write({
+            'state': 'material_planned',
         })
+        return stats
+    
+    def simulate_material_planning(self, quantities=None, compare=True):
+        """What-if material planning: explode, check availability and net
+        exactly like :meth:`action_material_planning`, without writing anything.
+        
+        :param quantities: optional dict ``{planning_id: product quantity}``
+            to simulate instead of the planned quantities
+        :param compare: also diff the result against the stored requirement lines
+        :return: dict ``{planning_id: {'requirements': [...], 'diff': {...}}}``;
+            ``diff`` holds the ``created`` values, the ``updated`` lines as
+            ``{'line_id', 'changes': {field: (stored, simulated)}}``, the
+            ``deleted`` line ids and the counts in ``stats``
+        """
+        # The stored explosion cache is read but never written
+        plannings, requirements = self.with_context(
+            bom_explosion_cache='readonly'
+        )._compute_material_plan(quantities)
+        result = {}
+        for planning in plannings:
+            result[planning.id] = {'requirements': requirements[planning.id]}
+            if not compare:
+                continue
+            to_create, to_write, obsolete, unchanged = self._match_lines(
+                planning.material_requirement_ids,
+                requirements[planning.id],
+                key_fields=['component_id', 'material_id'],
+                compare_fields=self._get_requirement_compare_fields(),
+            )
+            result[planning.id]['diff'] = {
+                'created': to_create,
+                'updated': [{
+                    'line_id': line.id,
+                    'component_id': line.component_id.id,
+                    'material_id': line.material_id.id,
+                    'changes': {fname: (line[fname], value) for fname, value in changes.items()},
+                } for line, changes in to_write],
+                'deleted': obsolete.ids,
+                'stats': {
+                    'created': len(to_create),
+                    'updated': len(to_write),
+                    'deleted': len(obsolete),
+                    'unchanged': unchanged,
+                },
+            }
+        return result
+    
+    def action_simulate_material_planning(self):
+        self.ensure_one()
+        if not self.component_line_ids:
+            raise UserError(_('Please load components first!'))
+        return {
+            'name': _('Simulate Material Planning'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'material.planning.simulation.wizard',
+            'view_mode': 'form',
+            'target': 'new',
+            'context': {
+                'default_planning_id': self.id,
+                'default_quantity': self.quantity,
+            }
+        }
+    
+    @api.model
+    def _get_mrp_run_domain(self):
+        return [
+            ('state', 'in', ['components_loaded', 'material_planned']),
+            ('component_line_ids', '!=', False),
+        ]
+    
+    def _get_portfolio_material_totals(self, backend=None):
+        """Total raw material requirements of all plannings in ``self``,
+        exploded at once with the portfolio backend of ``material.bom.explosion``.
+        
+        :return: dict ``{material_id: total quantity}``
+        """
+        demand = {}
+        totals = {}
+        for comp in self.component_line_ids:
+            if comp.bom_id:
+                demand[comp.bom_id.id] = demand.get(comp.bom_id.id, 0.0) + comp.quantity
+            else:
+                # Direct component without BOM
+                totals[comp.component_id.id] = totals.get(comp.component_id.id, 0.0) + comp.quantity
+        exploded = self.env['material.bom.explosion']._explode_portfolio_demand(demand, backend=backend)
+        for material_id, qty in exploded.items():
+            totals[material_id] = totals.get(material_id, 0.0) + qty
+        return totals
+    
+    def _run_mrp(self):
+        """Plan all plannings in ``self`` together, then check the requirement
+        lines against the portfolio totals.
+        
+        :return: tuple ``(stats, materials)``, the requirement line counts of
+            :meth:`_run_material_planning` and the number of materials required
+        """
+        stats = self._run_material_planning()
+        totals = self._get_portfolio_material_totals()
+        planned = {
+            material.id: required_qty
+            for material, required_qty in self.env['material.requirement.line']._read_group(
+                [('planning_id', 'in', self.ids)], ['material_id'], ['required_qty:sum'],
+            )
+        }
+        materials = self.env['product.product'].browse(totals.keys() | planned.keys())
+        mismatched = materials.filtered(lambda m: float_compare(
+            totals.get(m.id, 0.0), planned.get(m.id, 0.0), precision_rounding=m.uom_id.rounding
+        ) != 0)
+        if mismatched:
+            _logger.warning(
+                'MRP run: requirement lines differ from the portfolio totals for %s',
+                ', '.join(mismatched.mapped('display_name')),
+            )
+        return stats, len(totals)
+    
+    @api.model
+    def action_run_mrp(self):
+        """Plan all open plannings together against a shared stock snapshot"""
+        plannings = self.search(self._get_mrp_run_domain())
+        if not plannings:
+            raise UserError(_('No planning with loaded components to plan!'))
+        
+        stats, materials = plannings._run_mrp()
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('MRP Run Completed'),
+                'message': _('%s plannings planned, %s materials required.\nRequirement lines: %s') % (
+                    len(plannings), materials, self._format_sync_stats(stats)
+                ),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+    
+    @api.model
+    def _cron_run_mrp(self):
+        plannings = self.search(self._get_mrp_run_domain())
+        if plannings:
+            stats, materials = plannings._run_mrp()
+            _logger.info(
+                'MRP run planned %s plannings, %s materials: %s',
+                len(plannings), materials, self._format_sync_stats(stats),
+            )
+    
+    def action_material_planning(self):
+        self.ensure_one()
+        if not self.component_line_ids:
+            raise UserError(_('Please load components first!'))
+        
+        stats = self._run_material_planning()
         
         # Open wizard to show material requirements
         return {
@@ -272,7 +780,10 @@ class MaterialProductionPlanning(models.Model):
             'res_model': 'material.requirement.wizard',
             'view_mode': 'form',
             'target': 'new',
-            'context': {'default_planning_id': self.id}
+            'context': {
+                'default_planning_id': self.id,
+                'default_sync_summary': self._format_sync_stats(stats),
+            }
         }
     
     def action_create_work_orders(self):
@@ -307,6 +818,54 @@ class MaterialProductionPlanning(models.Model):
             'target': 'new',
         }
     
+    def _lock_for_production(self):
+        """Serialize the creation of production orders per planning.
+        
+        Odoo transactions run in repeatable read: one waiting on an advisory
+        lock would still check the quantities against its old snapshot. The
+        planning rows are locked instead; once the transaction holding them
+        commits, the waiting one fails with a serialization error and its
+        request is retried on a fresh snapshot. Other plannings are not
+        locked.
+        
+        The lock lasts until the end of the transaction: the validation and
+        the creation of the orders must run in that same transaction.
+        """
+        if not self:
+            return
+        self.env.cr.execute("""
+            SELECT id FROM material_production_planning
+             WHERE id = ANY(%s)
+          ORDER BY id
+               FOR UPDATE
+        """, [self.ids])
+        # The row is always rewritten so the waiting transaction sees a
+        # concurrent update, even if nothing else changes on the planning
+        self.env.cr.execute("""
+            UPDATE material_production_planning
+               SET write_uid = %s, write_date = (now() at time zone 'UTC')
+             WHERE id = ANY(%s)
+        """, [self.env.uid, self.ids])
+        self.invalidate_recordset(['write_uid', 'write_date'])
+        # Committing would release the lock half-way, see planning.job._commit_progress.
+        # The postcommit data lives until the transaction ends: unlike the
+        # precommit data, it is not cleared by the flush of a savepoint
+        self.env.cr.postcommit.data.setdefault('material.production.planning.locked', set()).update(self.ids)
+    
+    def _get_created_quantities(self, products):
+        """Quantities of ``products`` already ordered for the planning, read
+        from the database in one grouped query"""
+        self.ensure_one()
+        self.env['mrp.production'].flush_model(['planning_id', 'product_id', 'product_qty'])
+        return {
+            product.id: qty
+            for product, qty in self.env['mrp.production']._read_group(
+                [('planning_id', '=', self.id), ('product_id', 'in', products.ids)],
+                ['product_id'],
+                ['product_qty:sum'],
+            )
+        }
+    
     def action_done(self):
         self.write({'state': 'done'})
     
@@ -338,6 +897,13 @@ class MaterialPlanningComponent(models.Model):
         required=True,
         ondelete='cascade'
     )
+    pricing_component_id = fields.Many2one(
+        'project.product.component',
+        string='Pricing Component',
+        ondelete='set null',
+        index=True,
+        help='Pricing line this component was loaded from'
+    )
     component_id = fields.Many2one(
         'product.product',
         string='Component Product',
@@ -369,6 +935,12 @@ class MaterialPlanningComponent(models.Model):
         string='Specifications',
         compute='_compute_spec_count'
     )
+    additional_code = fields.Text(
+        string='Additional Code / Specifications',
+        compute='_compute_additional_code',
+        store=True,
+        help='Component specifications formatted as code'
+    )
     uom_id = fields.Many2one(
         'uom.uom',
         string='Unit of Measure',
@@ -376,6 +948,17 @@ class MaterialPlanningComponent(models.Model):
         readonly=True
     )
     
+    @api.depends('specification_ids', 'specification_ids.value', 'specification_ids.specification_name')
+    def _compute_additional_code(self):
+        """Compute additional code from specifications"""
+        for record in self:
+            specs = [
+                '%s: %s' % (spec.specification_name, spec.value)
+                for spec in record.specification_ids.sorted('sequence')
+                if spec.value
+            ]
+            record.additional_code = '\n'.join(specs)
+    
     @api.depends('specification_ids')
     def _compute_spec_count(self):
         for record in self:
@@ -424,11 +1007,28 @@ class MaterialRequirementLine(models.Model):
     )
     available_qty = fields.Float(
         string='Available Stock',
-        digits='Product Unit of Measure'
+        digits='Product Unit of Measure',
+        help='Free stock of the material before allocation'
+    )
+    allocated_qty = fields.Float(
+        string='Allocated Stock',
+        digits='Product Unit of Measure',
+        help='Part of the free stock allocated to this component'
     )
     shortage_qty = fields.Float(
         string='Shortage',
-        digits='Product Unit of Measure'
+        digits='Product Unit of Measure',
+        help='Net requirement left after stock allocation'
+    )
+    need_date = fields.Date(
+        string='Need Date',
+        index=True,
+        help='Date the material must be in stock, planned backwards from the '
+             'project end date through the manufacturing lead times'
+    )
+    order_date = fields.Date(
+        string='Order Before',
+        help='Latest purchase date given the lead time of the main vendor'
     )
     uom_id = fields.Many2one(
         'uom.uom',
@@ -436,3 +1036,27 @@ class MaterialRequirementLine(models.Model):
         related='material_id.uom_id',
         readonly=True
     )
+    
+    def _get_time_buckets(self, qty_field='shortage_qty', bucket_days=7, start_date=None):
+        """Sum ``qty_field`` of the lines into date buckets per material.
+        
+        The whole recordset (typically the lines of a portfolio of plannings)
+        is bucketed in one pass into one array of ``bucket_days`` wide buckets
+        per material, all sharing the same start date.
+        
+        :return: tuple ``(start_date, {material_id: array of quantities})``
+        """
+        dated = self.filtered('need_date')
+        if not dated:
+            return start_date, {}
+        start_date = start_date or min(dated.mapped('need_date'))
+        size = max((max(dated.mapped('need_date')) - start_date).days // bucket_days + 1, 1)
+        
+        buckets = {}
+        for line in dated:
+            index = min(max((line.need_date - start_date).days // bucket_days, 0), size - 1)
+            material_buckets = buckets.get(line.material_id.id)
+            if material_buckets is None:
+                material_buckets = buckets[line.material_id.id] = array('d', [0.0]) * size
+            material_buckets[index] += line[qty_field]
+        return start_date, buckets
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class MrpBom(models.Model):
+    _inherit = 'mrp.bom'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        boms = super(MrpBom, self).create(vals_list)
+        boms._invalidate_explosion_cache()
+        return boms
+
+    def write(self, vals):
+        res = super(MrpBom, self).write(vals)
+        self._invalidate_explosion_cache()
+        return res
+
+    def unlink(self):
+        self._invalidate_explosion_cache()
+        return super(MrpBom, self).unlink()
+
+    def _invalidate_explosion_cache(self):
+        """Drop the cached explosions of these BOMs and of every BOM using
+        their products, whose sub-assembly BOM may have changed"""
+        if not self:
+            return
+        products = self.product_id | self.product_tmpl_id.product_variant_ids
+        parent_lines = self.env['mrp.bom.line'].sudo().search([('product_id', 'in', products.ids)])
+        self.env['mrp.bom.explosion.cache']._invalidate_boms(set(self.ids) | set(parent_lines.bom_id.ids))
+
+
+class MrpBomLine(models.Model):
+    _inherit = 'mrp.bom.line'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super(MrpBomLine, self).create(vals_list)
+        self.env['mrp.bom.explosion.cache']._invalidate_boms(lines.bom_id.ids)
+        return lines
+
+    def write(self, vals):
+        bom_ids = set(self.bom_id.ids)
+        res = super(MrpBomLine, self).write(vals)
+        self.env['mrp.bom.explosion.cache']._invalidate_boms(bom_ids | set(self.bom_id.ids))
+        return res
+
+    def unlink(self):
+        self.env['mrp.bom.explosion.cache']._invalidate_boms(self.bom_id.ids)
+        return super(MrpBomLine, self).unlink()
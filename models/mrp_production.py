@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+
+class MrpProduction(models.Model):
+    _inherit = 'mrp.production'
+
+    planning_id = fields.Many2one(
+        'material.production.planning',
+        string='Material Planning',
+        index=True,
+        copy=False,
+        readonly=True,
+        ondelete='set null',
+        help='Planning this manufacturing order was created from'
+    )
+    project_definition_id = fields.Many2one(
+        'project.definition',
+        string='Project Definition',
+        index=True,
+        copy=False,
+        readonly=True,
+        ondelete='set null'
+    )
+
+    def _write(self, vals):
+        if 'product_qty' in vals:
+            # The quantity to produce of the work order operation lines; read
+            # in SQL since this runs while the ORM flushes
+            self.env.cr.execute("SELECT id FROM mrp_workorder WHERE production_id = ANY(%s)", [self.ids])
+            self.env['work.order.operation.line']._schedule_workorder_sync([row[0] for row in self.env.cr.fetchall()])
+        return super(MrpProduction, self)._write(vals)
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+
+class MrpWorkcenter(models.Model):
+    _inherit = 'mrp.workcenter'
+
+    max_batch_size = fields.Float(
+        string='Max Batch Size',
+        digits='Product Unit of Measure',
+        default=0.0,
+        help='Largest quantity processed in one manufacturing order on this work center '
+             '(e.g. oven or press capacity). Larger orders created from a planning are '
+             'split in balanced lots. 0 means no limit.'
+    )
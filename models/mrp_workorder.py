@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+# Workorder fields copied onto the work order operation lines
+SYNCED_FIELDS = {'operation_id', 'state', 'qty_produced', 'date_start', 'date_finished', 'production_id'}
+
+
+class MrpWorkorder(models.Model):
+    _inherit = 'mrp.workorder'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        workorders = super(MrpWorkorder, self).create(vals_list)
+        self.env['work.order.execution.line']._schedule_progress_update(workorders.production_id.ids)
+        return workorders
+
+    def _write(self, vals):
+        # The workorder state is a stored computed field: its changes reach
+        # the database through _write, not through write
+        if SYNCED_FIELDS & set(vals):
+            self.env['work.order.operation.line']._schedule_workorder_sync(self.ids)
+        if {'state', 'name', 'production_id'} & set(vals):
+            self.env.cr.execute(
+                "SELECT DISTINCT production_id FROM mrp_workorder WHERE id = ANY(%s)",
+                [self.ids],
+            )
+            production_ids = [row[0] for row in self.env.cr.fetchall()]
+            if vals.get('production_id'):
+                production_ids.append(vals['production_id'])
+            self.env['work.order.execution.line']._schedule_progress_update(production_ids)
+        return super(MrpWorkorder, self)._write(vals)
+
+    def unlink(self):
+        production_ids = self.production_id.ids
+        res = super(MrpWorkorder, self).unlink()
+        self.env['work.order.execution.line']._schedule_progress_update(production_ids)
+        return res
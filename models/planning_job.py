@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+import json
+import traceback
+from datetime import timedelta
+
+from psycopg2 import OperationalError
+
+from odoo import models, fields, api, SUPERUSER_ID, _
+from odoo.exceptions import UserError
+from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Jobs still running after this long were killed with their worker
+JOB_TIMEOUT_HOURS = 2
+
+# Times a job failing on a concurrent update is queued again before it fails
+JOB_MAX_RETRIES = 5
+
+# The only methods a job may run, on their model
+JOB_METHODS = {
+    ('work.order.creation.wizard', '_job_create_orders'),
+    ('work.order.execution', 'action_load_work_orders'),
+}
+
+
+class PlanningJob(models.Model):
+    """Background job run by the ``ir.cron`` job runner.
+
+    A job calls ``method_name`` on the ``record_ids`` of ``model_name`` as the
+    user who queued it, in its own transaction. Long methods can commit their
+    work in chunks and publish their progress with :meth:`_commit_progress`;
+    outside a job that call does nothing, so the same method also runs
+    synchronously in a single transaction.
+    """
+    _name = 'planning.job'
+    _description = 'Background Job'
+    _order = 'id desc'
+
+    name = fields.Char(string='Job', required=True, readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ], string='Status', default='pending', required=True, readonly=True, index=True)
+    model_name = fields.Char(string='Model', required=True, readonly=True)
+    method_name = fields.Char(string='Method', required=True, readonly=True)
+    record_ids = fields.Char(string='Records', readonly=True, default='[]')
+    kwargs = fields.Text(string='Arguments', readonly=True, default='{}')
+    user_id = fields.Many2one(
+        'res.users',
+        string='Requested By',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company
+    )
+    progress = fields.Float(string='Progress', readonly=True, default=0.0)
+    retry_count = fields.Integer(
+        string='Retries',
+        readonly=True,
+        default=0,
+        help='Times the job was queued again after a concurrent update'
+    )
+    date_started = fields.Datetime(string='Started', readonly=True)
+    date_done = fields.Datetime(string='Finished', readonly=True)
+    result_message = fields.Text(string='Result', readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+
+    @api.model
+    def _enqueue(self, records, method_name, name, **kwargs):
+        """Queue ``records.method_name(**kwargs)`` and wake up the job runner.
+
+        :param kwargs: JSON serializable keyword arguments
+        :return: the new job
+        """
+        job = self.sudo().create({
+            'name': name,
+            'model_name': records._name,
+            'method_name': method_name,
+            'record_ids': json.dumps(records.ids),
+            'kwargs': json.dumps(kwargs),
+            'user_id': self.env.user.id,
+            'company_id': self.env.company.id,
+        })
+        cron = self.env.ref('project_product_costing.ir_cron_planning_job_runner', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+        return job
+
+    @api.model
+    def _notify_queued(self, job):
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Job Queued'),
+                'message': _('%s will run in the background, you will be notified when it is done.') % job.name,
+                'type': 'info',
+                'sticky': False,
+                'next': {'type': 'ir.actions.act_window_close'},
+            }
+        }
+
+    @api.model
+    def _commit_progress(self, done, total):
+        """Commit the work done so far by the running job and publish its progress.
+
+        While the transaction holds the production lock of a planning, the
+        work is not committed: that would let concurrent wizards check their
+        quantities against a half-created set of orders.
+        """
+        job_id = self.env.context.get('planning_job_id')
+        if not job_id:
+            return
+        if self.env.cr.postcommit.data.get('material.production.planning.locked'):
+            self._report_progress(done, total)
+            return
+        job = self.sudo().browse(job_id)
+        job.progress = min(100.0 * done / total, 100.0) if total else 100.0
+        self.env.cr.commit()
+
+    @api.model
+    def _report_progress(self, done, total):
+        """Publish the progress of the running job without committing its work.
+
+        For methods whose work must be committed all at once or not at all.
+        The progress is sent on the bus from a separate cursor; it is not
+        written to the job, whose row :meth:`_run` writes once the work is
+        done: a concurrent update of that row would make the write fail.
+        """
+        job_id = self.env.context.get('planning_job_id')
+        if not job_id:
+            return
+        partner = self.sudo().browse(job_id).user_id.partner_id
+        with self.pool.cursor() as cr:
+            api.Environment(cr, SUPERUSER_ID, {})['bus.bus']._sendone(
+                partner,
+                'project_product_costing.job_progress',
+                {'job_id': job_id, 'progress': min(100.0 * done / total, 100.0) if total else 100.0},
+            )
+
+    @api.model
+    def _cron_run_jobs(self, limit=20):
+        """Run the pending jobs, oldest first, each in its own transaction"""
+        # Jobs of every user; each one runs as the user who queued it
+        self = self.sudo()
+        self.search([
+            ('state', '=', 'running'),
+            ('date_started', '<', fields.Datetime.now() - timedelta(hours=JOB_TIMEOUT_HOURS)),
+        ]).write({
+            'state': 'failed',
+            'error': _('Interrupted: the job did not finish within %s hours.') % JOB_TIMEOUT_HOURS,
+        })
+        self.env.cr.commit()
+
+        for dummy in range(limit):
+            # Another runner may pick jobs concurrently
+            self.env.cr.execute("""
+                SELECT id FROM planning_job
+                 WHERE state = 'pending'
+              ORDER BY id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+            """)
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            self.browse(row[0])._run()
+
+    def _run(self):
+        self.ensure_one()
+        self.write({'state': 'running', 'date_started': fields.Datetime.now(), 'progress': 0.0})
+        self.env.cr.commit()
+
+        try:
+            if (self.model_name, self.method_name) not in JOB_METHODS:
+                raise UserError(_('%s.%s cannot be run as a background job!') % (self.model_name, self.method_name))
+            Model = self.env[self.model_name].with_user(self.user_id).with_company(self.company_id)
+            records = Model.with_context(planning_job_id=self.id).browse(
+                json.loads(self.record_ids or '[]')
+            ).exists()
+            result = getattr(records, self.method_name)(**json.loads(self.kwargs or '{}'))
+            message = False
+            if isinstance(result, dict):
+                message = result.get('params', {}).get('message')
+            self.write({
+                'state': 'done',
+                'progress': 100.0,
+                'date_done': fields.Datetime.now(),
+                'result_message': message,
+            })
+            self.env.cr.commit()
+        except Exception as e:
+            self.env.cr.rollback()
+            if (isinstance(e, OperationalError) and e.pgcode in PG_CONCURRENCY_ERRORS_TO_RETRY
+                    and self.retry_count < JOB_MAX_RETRIES):
+                # A concurrent transaction won, e.g. on a planning production
+                # lock: run the job again on a fresh snapshot
+                _logger.info('Background job %s (%s) hit a concurrent update, retrying', self.id, self.name)
+                self.write({'state': 'pending', 'progress': 0.0, 'retry_count': self.retry_count + 1})
+                self.env.cr.commit()
+                return
+            _logger.exception('Background job %s (%s) failed', self.id, self.name)
+            self.write({
+                'state': 'failed',
+                'date_done': fields.Datetime.now(),
+                'error': traceback.format_exc(),
+            })
+            self.env.cr.commit()
+        self._notify_user()
+        self.env.cr.commit()
+
+    def _notify_user(self):
+        for job in self:
+            if job.state == 'done':
+                message = job.result_message or _('%s is done.') % job.name
+            else:
+                message = _('%s failed, see Background Jobs for details.') % job.name
+            self.env['bus.bus']._sendone(
+                job.user_id.partner_id,
+                'simple_notification',
+                {
+                    'title': job.name,
+                    'message': message,
+                    'type': 'success' if job.state == 'done' else 'danger',
+                    'sticky': job.state != 'done',
+                }
+            )
+
+    def _check_owner(self):
+        """Users only act on their own jobs, which they cannot write directly"""
+        if self.env.is_superuser() or self.env.user.has_group('mrp.group_mrp_manager'):
+            return
+        if self.filtered(lambda j: j.user_id != self.env.user):
+            raise UserError(_('You can only manage your own background jobs!'))
+
+    def action_retry(self):
+        self._check_owner()
+        if self.filtered(lambda j: j.state not in ('failed', 'cancelled')):
+            raise UserError(_('Only failed or cancelled jobs can be retried!'))
+        self.sudo().write({
+            'state': 'pending',
+            'progress': 0.0,
+            'retry_count': 0,
+            'error': False,
+            'date_done': False,
+        })
+        cron = self.env.ref('project_product_costing.ir_cron_planning_job_runner', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    def action_cancel(self):
+        self._check_owner()
+        if self.filtered(lambda j: j.state != 'pending'):
+            raise UserError(_('Only pending jobs can be cancelled!'))
+        self.sudo().write({'state': 'cancelled', 'date_done': fields.Datetime.now()})
+
+    @api.autovacuum
+    def _gc_finished_jobs(self):
+        self.search([
+            ('state', 'in', ['done', 'cancelled']),
+            ('date_done', '<', fields.Datetime.now() - timedelta(days=30)),
+        ]).unlink()
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+
+class ProductTemplate(models.Model):
+    _inherit = 'product.template'
+
+    max_batch_size = fields.Float(
+        string='Max Batch Size',
+        digits='Product Unit of Measure',
+        default=0.0,
+        help='Largest quantity produced in one manufacturing order. Overrides the '
+             'limit of the work centers of its BOM. 0 means no limit.'
+    )
@@ -2,6 +2,8 @@
 
 from odoo import models, fields, api, _
 
+from .stock_availability import AVAILABILITY_SQL
+
 
 class ProductionProgressReport(models.Model):
     _name = 'production.progress.report'
@@ -74,7 +76,7 @@ class ProductionProgressReport(models.Model):
                     project_product_component ppc ON ppc.pricing_id = pp.id
                 LEFT JOIN 
                     mrp_production mp ON mp.product_id = ppc.component_id
-                    AND mp.origin LIKE '%' || (SELECT name FROM project_definition WHERE id = pp.project_id) || '%'
+                    AND mp.project_definition_id = pp.project_id
                 WHERE 
                     pp.state IN ('confirmed', 'approved')
             )
@@ -117,6 +119,30 @@ class MaterialUsageReport(models.Model):
     ], string='Status', readonly=True)
 
     def init(self):
+        # Flattened leaf materials from the explosion cache; BOMs not exploded
+        # yet fall back to their direct lines, converted to the stock units
+        bom_leaves_sql = """
+            SELECT c.bom_id, c.company_id, cl.product_id, cl.quantity AS product_qty
+              FROM mrp_bom_explosion_cache c
+              JOIN mrp_bom_explosion_cache_line cl ON cl.cache_id = c.id
+            UNION ALL
+            SELECT l.bom_id, NULL AS company_id, l.product_id,
+                   (l.product_qty / lu.factor * mu.factor)
+                   / NULLIF(b.product_qty / bu.factor * tu.factor, 0) AS product_qty
+              FROM mrp_bom_line l
+              JOIN mrp_bom b ON b.id = l.bom_id
+              JOIN uom_uom lu ON lu.id = l.product_uom_id
+              JOIN product_product mp ON mp.id = l.product_id
+              JOIN product_template mt ON mt.id = mp.product_tmpl_id
+              JOIN uom_uom mu ON mu.id = mt.uom_id
+              JOIN uom_uom bu ON bu.id = b.product_uom_id
+              JOIN product_template bt ON bt.id = b.product_tmpl_id
+              JOIN uom_uom tu ON tu.id = bt.uom_id
+        """
+        availability_sql = AVAILABILITY_SQL.format(
+            quant_filter='TRUE',
+            move_filter="dest.usage != 'internal'",
+        )
         self._cr.execute("""
             CREATE OR REPLACE VIEW material_usage_report AS (
                 SELECT
@@ -129,9 +155,9 @@ class MaterialUsageReport(models.Model):
                     -- Required quantity
                     mbl.product_qty * ppc.quantity as required_quantity,
                     
-                    -- Stock availability
-                    COALESCE(sq.quantity, 0) as available_quantity,
-                    COALESCE(sq.reserved_quantity, 0) as reserved_quantity,
+                    -- Stock availability (on hand / committed to outgoing moves)
+                    COALESCE(avail.on_hand, 0) as available_quantity,
+                    COALESCE(avail.outgoing, 0) as reserved_quantity,
                     
                     -- Consumed
                     COALESCE(
@@ -141,7 +167,7 @@ class MaterialUsageReport(models.Model):
                          AND sm.raw_material_production_id IN (
                              SELECT id FROM mrp_production mp2
                              WHERE mp2.product_id = ppc.component_id
-                             AND mp2.origin LIKE '%' || (SELECT name FROM project_definition WHERE id = pp.project_id) || '%'
+                             AND mp2.project_definition_id = pp.project_id
                          )
                          AND sm.state = 'done'),
                         0
@@ -153,7 +179,7 @@ class MaterialUsageReport(models.Model):
                          FROM purchase_order_line pol
                          JOIN purchase_order po ON po.id = pol.order_id
                          WHERE pol.product_id = mbl.product_id
-                         AND po.origin LIKE '%' || (SELECT name FROM project_definition WHERE id = pp.project_id) || '%'
+                         AND po.project_definition_id = pp.project_id
                          AND po.state IN ('draft', 'sent', 'to approve', 'purchase')),
                         0
                     ) as ordered_quantity,
@@ -163,26 +189,26 @@ class MaterialUsageReport(models.Model):
                          FROM purchase_order_line pol
                          JOIN purchase_order po ON po.id = pol.order_id
                          WHERE pol.product_id = mbl.product_id
-                         AND po.origin LIKE '%' || (SELECT name FROM project_definition WHERE id = pp.project_id) || '%'
+                         AND po.project_definition_id = pp.project_id
                          AND po.state IN ('purchase', 'done')),
                         0
                     ) as received_quantity,
                     
                     -- Shortage
                     GREATEST(
-                        (mbl.product_qty * ppc.quantity) - COALESCE(sq.quantity, 0) - COALESCE(sq.reserved_quantity, 0),
+                        (mbl.product_qty * ppc.quantity) - COALESCE(avail.on_hand, 0) + COALESCE(avail.outgoing, 0),
                         0
                     ) as shortage_quantity,
                     
                     -- Status
                     CASE 
-                        WHEN COALESCE(sq.quantity, 0) >= (mbl.product_qty * ppc.quantity) THEN 'sufficient'
+                        WHEN COALESCE(avail.on_hand, 0) - COALESCE(avail.outgoing, 0) >= (mbl.product_qty * ppc.quantity) THEN 'sufficient'
                         WHEN COALESCE(
                             (SELECT SUM(pol.qty_received)
                              FROM purchase_order_line pol
                              JOIN purchase_order po ON po.id = pol.order_id
                              WHERE pol.product_id = mbl.product_id
-                             AND po.origin LIKE '%' || (SELECT name FROM project_definition WHERE id = pp.project_id) || '%'),
+                             AND po.project_definition_id = pp.project_id),
                             0
                         ) > 0 THEN 'received'
                         WHEN COALESCE(
@@ -190,10 +216,10 @@ class MaterialUsageReport(models.Model):
                              FROM purchase_order_line pol
                              JOIN purchase_order po ON po.id = pol.order_id
                              WHERE pol.product_id = mbl.product_id
-                             AND po.origin LIKE '%' || (SELECT name FROM project_definition WHERE id = pp.project_id) || '%'),
+                             AND po.project_definition_id = pp.project_id),
                             0
                         ) > 0 THEN 'ordered'
-                        WHEN COALESCE(sq.quantity, 0) > 0 THEN 'partial'
+                        WHEN COALESCE(avail.on_hand, 0) - COALESCE(avail.outgoing, 0) > 0 THEN 'partial'
                         ELSE 'shortage'
                     END as status
                     
@@ -204,12 +230,15 @@ class MaterialUsageReport(models.Model):
                 JOIN 
                     mrp_bom mb ON mb.id = ppc.bom_id
                 JOIN 
-                    mrp_bom_line mbl ON mbl.bom_id = mb.id
+                    ({bom_leaves}) mbl ON mbl.bom_id = mb.id
+                    AND (mbl.company_id = pp.company_id
+                         OR (mbl.company_id IS NULL AND NOT EXISTS (
+                             SELECT 1 FROM mrp_bom_explosion_cache c
+                              WHERE c.bom_id = mb.id AND c.company_id = pp.company_id)))
                 LEFT JOIN 
-                    stock_quant sq ON sq.product_id = mbl.product_id
-                    AND sq.location_id IN (SELECT id FROM stock_location WHERE usage = 'internal')
+                    ({availability}) avail ON avail.product_id = mbl.product_id
                 WHERE 
                     pp.state IN ('confirmed', 'approved')
                     AND ppc.bom_id IS NOT NULL
             )
-        """)
+        """.format(availability=availability_sql, bom_leaves=bom_leaves_sql))
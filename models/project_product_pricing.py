@@ -308,19 +308,24 @@ class ProjectProductComponent(models.Model):
         store=True,
         help='Component specifications formatted as code'
     )
+    specification_text = fields.Text(
+        string='Specifications Text',
+        compute='_compute_additional_code',
+        store=True,
+        help='Specifications on one line, shown on the work order operations'
+    )
 
     @api.depends('specification_ids', 'specification_ids.value', 'specification_ids.specification_name')
     def _compute_additional_code(self):
         """Compute additional code from specifications"""
         for record in self:
-            if record.specification_ids:
-                specs = []
-                for spec in record.specification_ids.sorted('sequence'):
-                    if spec.value:
-                        specs.append('%s: %s' % (spec.specification_name, spec.value))
-                record.additional_code = '\n'.join(specs) if specs else ''
-            else:
-                record.additional_code = ''
+            specs = [
+                '%s: %s' % (spec.specification_name, spec.value)
+                for spec in record.specification_ids.sorted('sequence')
+                if spec.value
+            ]
+            record.additional_code = '\n'.join(specs)
+            record.specification_text = ' | '.join(specs)
 
     @api.depends('specification_ids')
     def _compute_spec_count(self):
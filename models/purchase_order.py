@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+
+class PurchaseOrder(models.Model):
+    _inherit = 'purchase.order'
+
+    planning_id = fields.Many2one(
+        'material.production.planning',
+        string='Material Planning',
+        index=True,
+        copy=False,
+        readonly=True,
+        ondelete='set null',
+        help='Planning this RFQ was created from'
+    )
+    project_definition_id = fields.Many2one(
+        'project.definition',
+        string='Project Definition',
+        index=True,
+        copy=False,
+        readonly=True,
+        ondelete='set null'
+    )
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from odoo import models, api, _
+from odoo.exceptions import UserError
+
+# Free-text units found in imported spreadsheets, mapped to the standard units
+UNIT_ALIASES = {
+    'pcs': 'uom.product_uom_unit',
+    'pc': 'uom.product_uom_unit',
+    'piece': 'uom.product_uom_unit',
+    'pieces': 'uom.product_uom_unit',
+    'unit': 'uom.product_uom_unit',
+    'units': 'uom.product_uom_unit',
+    'unit(s)': 'uom.product_uom_unit',
+    'dozen': 'uom.product_uom_dozen',
+    'kg': 'uom.product_uom_kgm',
+    'kgs': 'uom.product_uom_kgm',
+    'kilogram': 'uom.product_uom_kgm',
+    'kilograms': 'uom.product_uom_kgm',
+    'g': 'uom.product_uom_gram',
+    'gram': 'uom.product_uom_gram',
+    'grams': 'uom.product_uom_gram',
+    't': 'uom.product_uom_ton',
+    'ton': 'uom.product_uom_ton',
+    'tons': 'uom.product_uom_ton',
+    'tonne': 'uom.product_uom_ton',
+    'l': 'uom.product_uom_litre',
+    'liter': 'uom.product_uom_litre',
+    'liters': 'uom.product_uom_litre',
+    'litre': 'uom.product_uom_litre',
+    'litres': 'uom.product_uom_litre',
+    'm': 'uom.product_uom_meter',
+    'meter': 'uom.product_uom_meter',
+    'meters': 'uom.product_uom_meter',
+    'metre': 'uom.product_uom_meter',
+    'metres': 'uom.product_uom_meter',
+    'cm': 'uom.product_uom_cm',
+    'mm': 'uom.product_uom_millimeter',
+    'km': 'uom.product_uom_km',
+    'm3': 'uom.product_uom_cubic_meter',
+    'm³': 'uom.product_uom_cubic_meter',
+    'hour': 'uom.product_uom_hour',
+    'hours': 'uom.product_uom_hour',
+    'day': 'uom.product_uom_day',
+    'days': 'uom.product_uom_day',
+}
+
+
+class UomUom(models.Model):
+    _inherit = 'uom.uom'
+
+    def write(self, vals):
+        res = super(UomUom, self).write(vals)
+        if {'factor', 'factor_inv', 'category_id'} & set(vals):
+            # Cached explosions are expressed in the stock unit of each material
+            self.env['mrp.bom.explosion.cache'].sudo().search([]).unlink()
+        return res
+
+    @api.model
+    def _get_factor_table(self):
+        """Conversion factors between every pair of units of the same category.
+
+        Loaded with one query so that callers converting many quantities (a
+        planning run, an RFQ) do not call ``_compute_quantity`` for each one.
+
+        :return: dict ``{(from_uom_id, to_uom_id): factor}``; a quantity in
+            ``from_uom_id`` multiplied by the factor is the quantity in
+            ``to_uom_id``
+        """
+        uoms = self.with_context(active_test=False).search_fetch([], ['category_id', 'factor'])
+        by_category = defaultdict(list)
+        for uom in uoms:
+            by_category[uom.category_id.id].append(uom)
+        table = {}
+        for units in by_category.values():
+            for from_uom in units:
+                for to_uom in units:
+                    table[from_uom.id, to_uom.id] = to_uom.factor / from_uom.factor
+        return table
+
+    @api.model
+    def _convert_with_table(self, table, qty, from_uom_id, to_uom_id):
+        """Convert ``qty`` with a table from :meth:`_get_factor_table`, without rounding"""
+        if from_uom_id == to_uom_id or not from_uom_id or not to_uom_id:
+            return qty
+        factor = table.get((from_uom_id, to_uom_id))
+        if factor is None:
+            from_uom, to_uom = self.browse(from_uom_id), self.browse(to_uom_id)
+            raise UserError(_(
+                'Cannot convert %s into %s: the units of measure belong to different categories.'
+            ) % (from_uom.name, to_uom.name))
+        return qty * factor
+
+    @api.model
+    def _find_from_text(self, unit_name):
+        """Return the unit matching a free-text unit name (e.g. 'kg', 'liter', 'pcs')"""
+        unit_name = (unit_name or '').strip()
+        if not unit_name:
+            return self.browse()
+        xmlid = UNIT_ALIASES.get(unit_name.lower())
+        uom = self.env.ref(xmlid, raise_if_not_found=False) if xmlid else None
+        return uom or self.search([('name', '=ilike', unit_name)], limit=1)
@@ -1,16 +1,70 @@
 # -*- coding: utf-8 -*-
 
+from collections import defaultdict
+
 from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError, ValidationError
 import logging
+import time
 
 _logger = logging.getLogger(__name__)
 
+# Execution lines created per batch, committed together in a background job
+EXECUTION_CHUNK_SIZE = 200
+
+
+# Operation line columns copied from the workorder
+WORKORDER_FIELDS = ('operation_id', 'state', 'qty_production', 'qty_produced', 'date_start', 'date_finished')
+
+
+# Change counter of a row: the 64-bit id of the last transaction writing it.
+# Compared with txid_snapshot_xmin() it tells which changes may still commit;
+# both txid functions exist from PostgreSQL 9.4 on, unlike their pg_ renames.
+CHANGE_STAMP = "txid_current()"
+
+
+class BenchmarkRollback(Exception):
+    """Raised to roll back the savepoint of a benchmark"""
+
+
+class WorkOrderChangeMixin(models.AbstractModel):
+    _name = 'work.order.change.mixin'
+    _description = 'Work Order Change Counter'
+
+    def init(self):
+        """Add the ``change_txid`` column, stamped by its default on insert
+        and by a trigger on every update, from the ORM or from SQL.
+
+        It is not an ORM field: transaction ids do not fit in an integer
+        field, and the ORM has no use for it.
+        """
+        if not self._auto:
+            return
+        self.env.cr.execute("""
+            ALTER TABLE %(table)s ADD COLUMN IF NOT EXISTS change_txid bigint NOT NULL DEFAULT %(stamp)s;
+
+            CREATE OR REPLACE FUNCTION work_order_stamp_change() RETURNS trigger AS $$
+            BEGIN
+                NEW.change_txid := %(stamp)s;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS %(table)s_stamp_change ON %(table)s;
+            CREATE TRIGGER %(table)s_stamp_change BEFORE UPDATE ON %(table)s
+               FOR EACH ROW EXECUTE PROCEDURE work_order_stamp_change();
+        """ % {'table': self._table, 'stamp': CHANGE_STAMP})
+        if 'execution_id' in self._fields:
+            tools.create_index(
+                self.env.cr, '%s_execution_id_change_txid_index' % self._table,
+                self._table, ['execution_id', 'change_txid'],
+            )
+
 
 class WorkOrderExecution(models.Model):
     _name = 'work.order.execution'
     _description = 'Work Order Execution'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'work.order.change.mixin']
     _order = 'create_date desc'
 
     name = fields.Char(
@@ -79,14 +133,31 @@ class WorkOrderExecution(models.Model):
 
     @api.depends('work_order_line_ids.production_state')
     def _compute_totals(self):
+        """Counted for all the executions to recompute with one grouped query.
+
+        The ORM only marks the executions when a production state changes and
+        recomputes them together at the next flush, so mass-completing
+        workorders costs one query here, not one per execution.
+        """
+        counts = defaultdict(lambda: defaultdict(int))
+        executions = self.filtered('id')
+        if executions:
+            for execution, state, count in self.env['work.order.execution.line']._read_group(
+                [('execution_id', 'in', executions.ids)],
+                ['execution_id', 'production_state'],
+                ['__count'],
+            ):
+                counts[execution.id][state] = count
+        for record in self - executions:
+            # New records in the form only exist in the cache
+            for line in record.work_order_line_ids:
+                counts[record.id][line.production_state] += 1
+
         for record in self:
-            record.total_components = len(record.work_order_line_ids)
-            record.completed_components = len(record.work_order_line_ids.filtered(
-                lambda l: l.production_state == 'done'
-            ))
-            record.in_progress_components = len(record.work_order_line_ids.filtered(
-                lambda l: l.production_state in ('confirmed', 'progress', 'to_close')
-            ))
+            states = counts[record.id]
+            record.total_components = sum(states.values())
+            record.completed_components = states['done']
+            record.in_progress_components = states['confirmed'] + states['progress'] + states['to_close']
 
     @api.onchange('project_id')
     def _onchange_project_id(self):
@@ -96,15 +167,13 @@ class WorkOrderExecution(models.Model):
             return {'domain': {'product_id': [('id', 'in', product_ids)]}}
         return {'domain': {'product_id': []}}
 
-    def action_load_work_orders(self):
+    def _get_planning(self):
+        """Latest planning of the project and product with production orders"""
         self.ensure_one()
 
         if not self.product_id or not self.project_id:
             raise UserError(_('Please select Project and Product first!'))
 
-        # Clear existing lines
-        self.work_order_line_ids.unlink()
-
         # Find material planning for this project and product
         planning = self.env['material.production.planning'].search([
             ('project_id', '=', self.project_id.id),
@@ -133,57 +202,47 @@ class WorkOrderExecution(models.Model):
 
         if not planning.production_order_ids:
             raise UserError(_('Material Planning exists but no production orders found!'))
+        return planning
 
-        # Get pricing reference to fetch additional code and specifications
+    def _get_pricing_components(self):
+        """Pricing line of each component, to fetch additional code and specifications
+
+        :return: dict ``{component_id: project.product.component}``
+        """
+        self.ensure_one()
         pricing = self.env['project.product.pricing'].search([
             ('project_id', '=', self.project_id.id),
             ('product_id', '=', self.product_id.id),
             ('state', 'in', ['confirmed', 'approved'])
         ], limit=1, order='create_date desc')
 
-        # Get all production orders from planning
-        productions = planning.production_order_ids
+        pricing_components = {}
+        for pricing_component in pricing.component_line_ids:
+            pricing_components.setdefault(pricing_component.component_id.id, pricing_component)
+        return pricing_components
 
-        # Create lines for each production order
-        total_operations = 0
-        for production in productions:
-            # Confirm production if in draft state
-            if production.state == 'draft':
-                production.action_confirm()
+    def action_load_work_orders(self):
+        self.ensure_one()
 
-            # Create workorders if they don't exist
-            if not production.workorder_ids and production.state in ('confirmed', 'progress'):
-                try:
-                    production._create_workorder()
-                    _logger.info('Created workorders for production %s', production.name)
-                except Exception as e:
-                    _logger.warning('Could not create workorders for %s: %s', production.name, str(e))
+        planning = self._get_planning()
 
-            # Get additional code and specifications from pricing
-            additional_code = ''
-            specification_ids = []
+        # Clear existing lines
+        self.work_order_line_ids.unlink()
 
-            if pricing:
-                pricing_component = pricing.component_line_ids.filtered(
-                    lambda c: c.component_id == production.product_id
-                )
-                if pricing_component:
-                    additional_code = pricing_component[0].additional_code or ''
-                    specification_ids = pricing_component[0].specification_ids.ids
+        # Get all production orders from planning
+        productions = planning.production_order_ids
+        pricing_components = self._get_pricing_components()
 
-            # Create execution line
-            line = self.env['work.order.execution.line'].create({
-                'execution_id': self.id,
-                'component_id': production.product_id.id,
-                'quantity': production.product_qty,
-                'weight': production.product_id.weight * production.product_qty,
-                'production_id': production.id,
-                'additional_code': additional_code,
-            })
+        # Confirm the drafts and create the missing workorders, in one batch
+        self._prepare_productions(productions)
 
-            # Create operation lines for each workorder
-            ops_created = self._load_operations_for_line(line, specification_ids)
-            total_operations += ops_created
+        Job = self.env['planning.job']
+        total_operations = 0
+        for start in range(0, len(productions), EXECUTION_CHUNK_SIZE):
+            chunk = productions[start:start + EXECUTION_CHUNK_SIZE]
+            total_operations += self._create_execution_lines(chunk, pricing_components)
+            # In a background job, the loaded chunks are committed
+            Job._commit_progress(start + len(chunk), len(productions))
 
         self.state = 'loaded'
 
@@ -198,15 +257,186 @@ class WorkOrderExecution(models.Model):
             }
         }
 
-    def _load_operations_for_line(self, execution_line, specification_ids):
-        """Load operations for a production order into operation lines"""
-        if not execution_line.production_id.workorder_ids:
-            _logger.warning('No workorders found for production %s', execution_line.production_id.name)
-            return 0
+    def action_load_work_orders_background(self):
+        """Queue :meth:`action_load_work_orders` as a background job"""
+        self.ensure_one()
+        if not self.product_id or not self.project_id:
+            raise UserError(_('Please select Project and Product first!'))
+        job = self.env['planning.job']._enqueue(
+            self, 'action_load_work_orders', _('Load Work Orders: %s') % self.name
+        )
+        return self.env['planning.job']._notify_queued(job)
+
+    def action_sync_work_orders(self):
+        """Add the lines of new productions and workorders, keeping the actuals of the others"""
+        self.ensure_one()
+        stats = self._sync_work_orders()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Success'),
+                'message': _('%s work orders added with %s operations, %s removed.') % (
+                    stats['added'], stats['operations'], stats['removed']
+                ),
+                'type': 'success',
+                'sticky': False,
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
+
+    def _sync_work_orders(self):
+        """Bring the lines in line with the planning productions.
+
+        Lines of new productions and operation lines of new workorders are
+        created; lines of cancelled productions, or of productions no longer
+        in the planning, are removed. Existing lines are left untouched, so
+        the actual durations and resources entered on them are kept. The
+        productions are neither confirmed nor given workorders here: draft
+        productions get their operation lines once they are confirmed.
+
+        :return: dict with the number of ``added`` and ``removed`` lines and
+            of created ``operations``
+        """
+        self.ensure_one()
+        planning = self._get_planning()
+        productions = planning.production_order_ids.filtered(lambda p: p.state != 'cancel')
+
+        lines = self.work_order_line_ids
+        obsolete = lines.filtered(lambda l: l.production_id not in productions)
+        obsolete.unlink()
+        lines -= obsolete
+        # Operation lines whose workorder was deleted
+        self.env['work.order.operation.line'].search([
+            ('execution_line_id', 'in', lines.ids),
+            ('workorder_id', '=', False),
+        ]).unlink()
+
+        new_productions = productions - lines.production_id
+        stats = {'added': len(new_productions), 'removed': len(obsolete), 'operations': 0}
+        if not new_productions and not lines:
+            return stats
+
+        pricing_components = self._get_pricing_components()
+        if new_productions:
+            lines |= self._create_execution_lines(new_productions, pricing_components, create_operations=False)
+        stats['operations'] = self._create_operation_lines(lines, pricing_components)
+        if self.state == 'draft':
+            self.state = 'loaded'
+        return stats
+
+    @api.model
+    def _cron_sync_work_orders(self):
+        """Sync the open executions, each one in its own savepoint"""
+        for execution in self.search([('state', 'in', ['loaded', 'in_progress'])]):
+            try:
+                with self.env.cr.savepoint():
+                    execution._sync_work_orders()
+            except Exception:
+                _logger.exception('Could not sync work order execution %s', execution.name)
+
+    def _prepare_productions(self, productions):
+        """Confirm the draft productions and create their missing workorders, in batch"""
+        drafts = productions.filtered(lambda p: p.state == 'draft')
+        if drafts:
+            drafts.action_confirm()
+
+        missing = productions.filtered(
+            lambda p: not p.workorder_ids and p.state in ('confirmed', 'progress')
+        )
+        if not missing:
+            return
+        try:
+            with self.env.cr.savepoint():
+                missing._create_workorder()
+        except Exception:
+            # Find out which productions fail, the others still get their workorders
+            for production in missing:
+                try:
+                    with self.env.cr.savepoint():
+                        production._create_workorder()
+                except Exception as e:
+                    _logger.warning('Could not create workorders for %s: %s', production.name, str(e))
+        _logger.info('Created workorders for %d productions', len(missing))
+
+    def _create_execution_lines(self, productions, pricing_components, create_operations=True):
+        """Create the execution lines of ``productions`` with one ``create``
+        call, and their operation lines with another.
+
+        :param pricing_components: dict ``{component_id: pricing component line}``
+        :return: the execution lines, or when ``create_operations`` is set
+            the number of operation lines created
+        """
+        Pricing = self.env['project.product.component']
+        line_vals = []
+        for production in productions:
+            pricing_component = pricing_components.get(production.product_id.id, Pricing)
+            line_vals.append({
+                'execution_id': self.id,
+                'component_id': production.product_id.id,
+                'quantity': production.product_qty,
+                'weight': production.product_id.weight * production.product_qty,
+                'production_id': production.id,
+                'additional_code': pricing_component.additional_code or '',
+            })
+        lines = self.env['work.order.execution.line'].create(line_vals)
+        if not create_operations:
+            return lines
+        return self._create_operation_lines(lines, pricing_components)
+
+    def _create_operation_lines(self, lines, pricing_components):
+        """Create the missing operation lines of ``lines``, one per workorder
+        without one, numbered after the existing operations of each line.
+
+        :return: number of operation lines created
+        """
+        OperationLine = self.env['work.order.operation.line']
+        existing = {
+            line.id: (sequence, workorder_ids)
+            for line, sequence, workorder_ids in OperationLine._read_group(
+                [('execution_line_id', 'in', lines.ids)],
+                ['execution_line_id'],
+                ['sequence:max', 'workorder_id:array_agg'],
+            )
+        }
+        linked_ids = [wo_id for dummy, workorder_ids in existing.values() for wo_id in workorder_ids if wo_id]
 
+        workorders = self.env['mrp.workorder'].search_fetch(
+            [('production_id', 'in', lines.production_id.ids), ('id', 'not in', linked_ids)],
+            ['production_id', 'name', 'operation_id', 'workcenter_id', 'duration_expected'],
+            order='id',
+        )
+        workorders_by_production = {}
+        for workorder in workorders:
+            workorders_by_production.setdefault(workorder.production_id.id, []).append(workorder)
+
+        Pricing = self.env['project.product.component']
         operation_vals = []
-        sequence = 10
-        for workorder in execution_line.production_id.workorder_ids.sorted(lambda w: w.id):
+        for line in lines:
+            production_workorders = workorders_by_production.get(line.production_id.id)
+            if not production_workorders:
+                # Draft productions get their workorders when they are confirmed
+                if line.id not in existing and line.production_id.state != 'draft':
+                    _logger.warning('No workorders found for production %s', line.production_id.name)
+                continue
+            pricing_component = pricing_components.get(line.component_id.id, Pricing)
+            operation_vals += self._prepare_operation_line_vals(
+                line,
+                production_workorders,
+                pricing_component,
+                sequence=(existing.get(line.id, (0, []))[0] or 0) + 10,
+            )
+
+        # Create operation lines
+        if operation_vals:
+            OperationLine.create(operation_vals)
+            _logger.info('Created %d operation lines for %d productions', len(operation_vals), len(lines))
+        return len(operation_vals)
+
+    def _prepare_operation_line_vals(self, execution_line, workorders, pricing_component, sequence=10):
+        """Operation line values of an execution line, one per workorder"""
+        operation_vals = []
+        for workorder in workorders:
             # Get operation name
             op_name = workorder.name
             if not op_name and workorder.operation_id:
@@ -221,41 +451,37 @@ class WorkOrderExecution(models.Model):
                 'workcenter_id': workorder.workcenter_id.id if workorder.workcenter_id else False,
                 'duration_expected': workorder.duration_expected or 0.0,
                 'sequence': sequence,
-                'additional_code': execution_line.additional_code,
-                'specification_ids': [(6, 0, specification_ids)],
+                'pricing_component_id': pricing_component.id,
             })
             sequence += 10
+        return operation_vals
 
-        # Create operation lines
-        if operation_vals:
-            self.env['work.order.operation.line'].create(operation_vals)
-            _logger.info('Created %d operation lines for %s', len(operation_vals), execution_line.component_id.name)
-            return len(operation_vals)
-
-        return 0
-
-    def action_start_selected(self):
-        """Start selected work orders"""
+    def _get_selected_lines(self):
+        self.ensure_one()
         selected_lines = self.work_order_line_ids.filtered(lambda l: l.selected)
-
         if not selected_lines:
-            raise UserError(_('Please select at least one work order to start!'))
+            raise UserError(_('Please select at least one work order!'))
+        return selected_lines
 
-        for line in selected_lines:
-            line.action_start_production()
-
-        self.state = 'in_progress'
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _('Success'),
-                'message': _('%s work orders started!') % len(selected_lines),
-                'type': 'success',
-                'sticky': False,
-            }
-        }
+    def action_start_selected(self):
+        """Start selected work orders"""
+        selected_lines = self._get_selected_lines()
+        outcomes = selected_lines._start_productions()
+        if any(status == 'done' for status, message in outcomes.values()):
+            self.state = 'in_progress'
+        return selected_lines._notify_outcomes(_('Start Work Orders'), outcomes)
+
+    def action_next_selected(self):
+        """Move the selected work orders to their next operation"""
+        selected_lines = self._get_selected_lines()
+        outcomes = selected_lines._next_operations()
+        return selected_lines._notify_outcomes(_('Next Operation'), outcomes)
+
+    def action_finish_selected(self):
+        """Finish the operations in progress of the selected work orders"""
+        selected_lines = self._get_selected_lines()
+        outcomes = selected_lines._finish_operations()
+        return selected_lines._notify_outcomes(_('Finish Operations'), outcomes)
 
     def action_done(self):
         self.write({'state': 'done'})
@@ -487,6 +713,7 @@ class WorkOrderExecution(models.Model):
 class WorkOrderExecutionLine(models.Model):
     _name = 'work.order.execution.line'
     _description = 'Work Order Execution Line'
+    _inherit = ['work.order.change.mixin']
     _order = 'sequence, id'
 
     sequence = fields.Integer(string='Sequence', default=10)
@@ -494,7 +721,8 @@ class WorkOrderExecutionLine(models.Model):
         'work.order.execution',
         string='Execution',
         required=True,
-        ondelete='cascade'
+        ondelete='cascade',
+        index=True
     )
     selected = fields.Boolean(
         string='Select',
@@ -516,7 +744,8 @@ class WorkOrderExecutionLine(models.Model):
     production_id = fields.Many2one(
         'mrp.production',
         string='Production Order',
-        required=True
+        required=True,
+        index=True
     )
     production_state = fields.Selection(
         related='production_id.state',
@@ -536,84 +765,274 @@ class WorkOrderExecutionLine(models.Model):
         string='Operations'
     )
 
+    # Workorder counters, stored so that lists and reports read them from
+    # columns; kept up to date by the mrp.workorder write hook
+    total_count = fields.Integer(
+        string='Operations',
+        compute='_compute_progress_counters',
+        store=True
+    )
+    done_count = fields.Integer(
+        string='Done Operations',
+        compute='_compute_progress_counters',
+        store=True
+    )
     current_operation = fields.Char(
         string='Current Operation',
-        compute='_compute_current_operation'
+        compute='_compute_progress_counters',
+        store=True
     )
     progress_percentage = fields.Float(
         string='Progress %',
-        compute='_compute_progress'
+        compute='_compute_progress_counters',
+        store=True
     )
 
-    @api.depends('production_id', 'production_id.workorder_ids', 'production_id.workorder_ids.state')
-    def _compute_current_operation(self):
+    @api.depends('production_id')
+    def _compute_progress_counters(self):
+        counters = self._read_progress_counters(self.production_id.ids)
         for line in self:
-            if line.production_id and line.production_id.workorder_ids:
-                current_wo = line.production_id.workorder_ids.filtered(
-                    lambda w: w.state in ('ready', 'progress')
-                )
-                if current_wo:
-                    line.current_operation = current_wo[0].name
-                else:
-                    done_count = len(line.production_id.workorder_ids.filtered(lambda w: w.state == 'done'))
-                    total_count = len(line.production_id.workorder_ids)
-                    if done_count == total_count:
-                        line.current_operation = _('All Operations Complete')
-                    else:
-                        line.current_operation = _('Not Started')
-            else:
-                line.current_operation = _('No Operations')
+            (
+                line.total_count,
+                line.done_count,
+                line.progress_percentage,
+                line.current_operation,
+            ) = counters.get(line.production_id.id) or (0, 0, 0.0, _('No Operations'))
 
-    @api.depends('production_id', 'production_id.workorder_ids.state')
-    def _compute_progress(self):
+    @api.model
+    def _read_progress_counters(self, production_ids):
+        """Workorder counters of ``production_ids``, read with one query
+
+        :return: dict ``{production_id: (total, done, progress %, current operation)}``
+        """
+        if not production_ids:
+            return {}
+        self.env['mrp.workorder'].flush_model(['production_id', 'state', 'name'])
+        self.env.cr.execute("""
+            SELECT production_id,
+                   COUNT(*),
+                   COUNT(*) FILTER (WHERE state = 'done'),
+                   (ARRAY_AGG(name ORDER BY id) FILTER (WHERE state IN ('ready', 'progress')))[1]
+              FROM mrp_workorder
+             WHERE production_id = ANY(%s)
+          GROUP BY production_id
+        """, [list(production_ids)])
+        counters = {}
+        for production_id, total, done, current in self.env.cr.fetchall():
+            if not current:
+                current = _('All Operations Complete') if done == total else _('Not Started')
+            counters[production_id] = (total, done, done / total * 100 if total else 0.0, current)
+        return counters
+
+    @api.model
+    def _schedule_progress_update(self, production_ids):
+        """Update the counters of the lines of ``production_ids`` once, when
+        the transaction commits, however many workorders changed"""
+        data = self.env.cr.precommit.data
+        pending = data.get('work.order.execution.line.progress')
+        if pending is None:
+            pending = data['work.order.execution.line.progress'] = set()
+            self.env.cr.precommit.add(self._run_progress_update)
+        pending.update(production_ids)
+
+    def _run_progress_update(self):
+        production_ids = self.env.cr.precommit.data.pop('work.order.execution.line.progress', set())
+        production_ids.discard(None)
+        if production_ids:
+            self._update_progress_counters(production_ids)
+
+    @api.model
+    def _update_progress_counters(self, production_ids):
+        """Write the counters of the lines of ``production_ids`` in one statement"""
+        counters = self._read_progress_counters(production_ids)
+        no_operations = (0, 0, 0.0, _('No Operations'))
+        rows = [(production_id,) + (counters.get(production_id) or no_operations) for production_id in production_ids]
+        self.flush_model(['production_id'])
+        self.env.cr.execute("""
+            UPDATE work_order_execution_line AS line
+               SET total_count = c.total,
+                   done_count = c.done,
+                   progress_percentage = c.progress,
+                   current_operation = c.current,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM unnest(%s::int[], %s::int[], %s::int[], %s::float8[], %s::varchar[])
+                   AS c(production_id, total, done, progress, current)
+             WHERE line.production_id = c.production_id
+               AND (line.total_count, line.done_count, line.progress_percentage, line.current_operation)
+                   IS DISTINCT FROM (c.total, c.done, c.progress, c.current)
+        """, [self.env.uid] + [list(column) for column in zip(*rows)])
+        self.invalidate_model([
+            'total_count', 'done_count', 'progress_percentage', 'current_operation', 'write_uid', 'write_date',
+        ])
+
+    @api.model
+    def _call_in_batch(self, records, method_name):
+        """Call ``method_name`` on all ``records`` at once.
+
+        If the batch call fails, it is retried record by record so that one
+        failing record does not block the others.
+
+        :return: dict ``{record id: error message}`` of the failed records
+        """
+        if not records:
+            return {}
+        try:
+            with self.env.cr.savepoint():
+                getattr(records, method_name)()
+            return {}
+        except Exception:
+            failures = {}
+            for record in records:
+                try:
+                    with self.env.cr.savepoint():
+                        getattr(record, method_name)()
+                except Exception as e:
+                    failures[record.id] = str(e.args[0]) if isinstance(e, UserError) and e.args else str(e)
+            return failures
+
+    @api.model
+    def _first_workorder(self, production, states):
+        return production.workorder_ids.filtered(lambda w: w.state in states)[:1]
+
+    def _start_productions(self):
+        """Confirm, reserve and start the first workorder of the productions
+        of the lines, each step in one batch per state.
+
+        :return: dict ``{line: (status, message)}``, status being ``done``,
+            ``skipped`` or ``failed``
+        """
+        productions = self.production_id
+        failures = self._call_in_batch(productions.filtered(lambda p: p.state == 'draft'), 'action_confirm')
+        confirmed = productions.filtered(lambda p: p.state == 'confirmed' and p.id not in failures)
+        failures.update(self._call_in_batch(confirmed, 'action_assign'))
+
+        first_workorders = {
+            production.id: self._first_workorder(production, ('pending', 'ready', 'waiting'))
+            for production in confirmed if production.id not in failures
+        }
+        workorders = self.env['mrp.workorder'].union(*first_workorders.values())
+        wo_failures = self._call_in_batch(workorders, 'button_start')
+
+        states = dict(self.env['mrp.production']._fields['state']._description_selection(self.env))
+        outcomes = {}
         for line in self:
-            if line.production_id and line.production_id.workorder_ids:
-                total = len(line.production_id.workorder_ids)
-                done = len(line.production_id.workorder_ids.filtered(
-                    lambda w: w.state == 'done'
+            production = line.production_id
+            workorder = first_workorders.get(production.id)
+            if production.id in failures:
+                outcomes[line] = ('failed', failures[production.id])
+            elif workorder and workorder.id in wo_failures:
+                outcomes[line] = ('failed', wo_failures[workorder.id])
+            elif workorder:
+                outcomes[line] = ('done', _('Started %s') % workorder.name)
+            elif production.id in first_workorders:
+                outcomes[line] = ('done', _('Reserved, no operation to start'))
+            else:
+                outcomes[line] = ('skipped', _('Production is %s') % states.get(production.state))
+        return outcomes
+
+    def _next_operations(self):
+        """Finish the operation in progress of each line and start the next
+        one, with one ``button_finish`` and one ``button_start`` call"""
+        current = {
+            line: self._first_workorder(line.production_id, ('progress',))
+            for line in self
+        }
+        to_finish = self.env['mrp.workorder'].union(*current.values())
+        finish_failures = self._call_in_batch(to_finish, 'button_finish')
+
+        following = {
+            line: self._first_workorder(line.production_id, ('ready', 'waiting'))
+            for line, workorder in current.items()
+            if workorder and workorder.id not in finish_failures
+        }
+        to_start = self.env['mrp.workorder'].union(*following.values())
+        start_failures = self._call_in_batch(to_start, 'button_start')
+
+        outcomes = {}
+        for line, workorder in current.items():
+            next_wo = following.get(line)
+            if not line.production_id.workorder_ids:
+                outcomes[line] = ('skipped', _('No work orders found for this production!'))
+            elif not workorder:
+                outcomes[line] = ('skipped', _('No work order in progress!'))
+            elif workorder.id in finish_failures:
+                outcomes[line] = ('failed', finish_failures[workorder.id])
+            elif next_wo and next_wo.id in start_failures:
+                outcomes[line] = ('failed', _('Finished %s, could not start %s: %s') % (
+                    workorder.name, next_wo.name, start_failures[next_wo.id]
                 ))
-                line.progress_percentage = (done / total * 100) if total > 0 else 0
+            elif next_wo:
+                outcomes[line] = ('done', _('Finished %s, started %s') % (workorder.name, next_wo.name))
             else:
-                line.progress_percentage = 0
+                outcomes[line] = ('done', _('Finished %s, last operation') % workorder.name)
+        return outcomes
+
+    def _finish_operations(self):
+        """Finish the operations in progress of the lines with one ``button_finish`` call"""
+        in_progress = {
+            line: line.production_id.workorder_ids.filtered(lambda w: w.state in ('progress', 'to_close'))
+            for line in self
+        }
+        failures = self._call_in_batch(self.env['mrp.workorder'].union(*in_progress.values()), 'button_finish')
+
+        outcomes = {}
+        for line, workorders in in_progress.items():
+            failed = [failures[wo.id] for wo in workorders if wo.id in failures]
+            if not workorders:
+                outcomes[line] = ('skipped', _('No work order in progress!'))
+            elif failed:
+                outcomes[line] = ('failed', failed[0])
+            else:
+                outcomes[line] = ('done', _('Finished %s') % ', '.join(workorders.mapped('name')))
+        return outcomes
+
+    @api.model
+    def _notify_outcomes(self, title, outcomes):
+        """Notification summing up per-line outcomes ``{record: (status, message)}``.
+
+        A single record that could not be moved raises its message instead,
+        as the row buttons always did.
+        """
+        if len(outcomes) == 1:
+            status, message = next(iter(outcomes.values()))
+            if status != 'done':
+                raise UserError(message)
+
+        counts = {'done': 0, 'skipped': 0, 'failed': 0}
+        details = []
+        for record, (status, message) in outcomes.items():
+            counts[status] += 1
+            if status != 'done':
+                details.append('• %s: %s' % (record.display_name, message))
+        summary = _('%(done)s done, %(skipped)s skipped, %(failed)s failed.') % counts
+        if details:
+            summary += '\n' + '\n'.join(details[:20])
+            if len(details) > 20:
+                summary += '\n' + _('... and %s more') % (len(details) - 20)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': title,
+                'message': summary,
+                'type': 'danger' if counts['failed'] else ('warning' if counts['skipped'] else 'success'),
+                'sticky': bool(details),
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
 
     def action_start_production(self):
         """Start production order"""
-        self.ensure_one()
-
-        if self.production_id.state == 'draft':
-            self.production_id.action_confirm()
-
-        if self.production_id.state == 'confirmed':
-            self.production_id.action_assign()
-
-            if self.production_id.workorder_ids:
-                first_wo = self.production_id.workorder_ids.filtered(
-                    lambda w: w.state in ('pending', 'ready', 'waiting')
-                )
-                if first_wo:
-                    first_wo[0].button_start()
+        return self._notify_outcomes(_('Start Work Orders'), self._start_productions())
 
     def action_next_operation(self):
         """Move to next operation"""
-        self.ensure_one()
+        return self._notify_outcomes(_('Next Operation'), self._next_operations())
 
-        if not self.production_id.workorder_ids:
-            raise UserError(_('No work orders found for this production!'))
-
-        current_wo = self.production_id.workorder_ids.filtered(
-            lambda w: w.state == 'progress'
-        )
-
-        if current_wo:
-            current_wo[0].button_finish()
-
-            next_wo = self.production_id.workorder_ids.filtered(
-                lambda w: w.state in ('ready', 'waiting')
-            )
-            if next_wo:
-                next_wo[0].button_start()
-        else:
-            raise UserError(_('No work order in progress!'))
+    def action_finish_operation(self):
+        """Finish the operations in progress"""
+        return self._notify_outcomes(_('Finish Operations'), self._finish_operations())
 
     def action_view_production(self):
         """View production order"""
@@ -631,6 +1050,7 @@ class WorkOrderExecutionLine(models.Model):
 class WorkOrderOperationLine(models.Model):
     _name = 'work.order.operation.line'
     _description = 'Work Order Operation Line'
+    _inherit = ['work.order.change.mixin']
     _order = 'sequence, id'
 
     sequence = fields.Integer(string='Sequence', default=10)
@@ -695,19 +1115,18 @@ class WorkOrderOperationLine(models.Model):
     operation_id = fields.Many2one(
         'mrp.routing.workcenter',
         string='Operation',
-        related='workorder_id.operation_id',
-        store=True,
-        readonly=True
+        compute='_compute_workorder_values',
+        store=True
     )
     workcenter_id = fields.Many2one(
         'mrp.workcenter',
         string='Work Center'
     )
     state = fields.Selection(
-        related='workorder_id.state',
+        selection=lambda self: self.env['mrp.workorder']._fields['state'].selection,
         string='State',
-        store=True,
-        readonly=True
+        compute='_compute_workorder_values',
+        store=True
     )
     duration_expected = fields.Float(
         string='Expected Duration (minutes)'
@@ -733,50 +1152,43 @@ class WorkOrderOperationLine(models.Model):
     )
 
     qty_production = fields.Float(
-        related='workorder_id.qty_production',
         string='Quantity to Produce',
-        store=True,
-        readonly=True
+        compute='_compute_workorder_values',
+        store=True
     )
     qty_produced = fields.Float(
-        related='workorder_id.qty_produced',
         string='Quantity Produced',
-        store=True,
-        readonly=True
+        compute='_compute_workorder_values',
+        store=True
     )
 
-    # NEW: Additional Code and Specifications from pricing
+    # Additional Code and Specifications, shared with the pricing component
+    # rather than copied onto every operation
+    pricing_component_id = fields.Many2one(
+        'project.product.component',
+        string='Pricing Component',
+        readonly=True,
+        index=True,
+        ondelete='set null',
+        help='Pricing line the specifications of the operation come from'
+    )
     additional_code = fields.Text(
         string='Additional Code',
+        related='pricing_component_id.additional_code',
         help='Component specifications from pricing'
     )
-    specification_ids = fields.Many2many(
+    specification_ids = fields.One2many(
         'component.specification.value',
-        'operation_specification_rel',
-        'operation_id',
-        'specification_id',
         string='Specifications',
+        related='pricing_component_id.specification_ids',
         help='Component specifications from pricing'
     )
     specification_text = fields.Text(
         string='Specifications Text',
-        compute='_compute_specification_text',
-        store=True,
+        related='pricing_component_id.specification_text',
         help='Formatted text of all specifications'
     )
 
-    @api.depends('specification_ids', 'specification_ids.value', 'specification_ids.specification_name')
-    def _compute_specification_text(self):
-        for record in self:
-            if record.specification_ids:
-                specs = []
-                for spec in record.specification_ids.sorted('sequence'):
-                    if spec.value:
-                        specs.append('%s: %s' % (spec.specification_name, spec.value))
-                record.specification_text = ' | '.join(specs) if specs else ''
-            else:
-                record.specification_text = ''
-
     selected = fields.Boolean(
         string='Select',
         help='Select this operation for batch update'
@@ -793,18 +1205,33 @@ class WorkOrderOperationLine(models.Model):
         store=True
     )
     date_start = fields.Datetime(
-        related='workorder_id.date_start',
         string='Start Date',
-        store=True,
-        readonly=True
+        compute='_compute_workorder_values',
+        store=True
     )
     date_finished = fields.Datetime(
-        related='workorder_id.date_finished',
         string='Finish Date',
-        store=True,
-        readonly=True
+        compute='_compute_workorder_values',
+        store=True
     )
 
+    @api.depends('workorder_id')
+    def _compute_workorder_values(self):
+        """Copy of the workorder values, set when the workorder is linked.
+
+        Later workorder changes are copied by :meth:`_sync_from_workorders`
+        in one statement per transaction, instead of a recompute per line
+        on every workorder write.
+        """
+        for record in self:
+            workorder = record.workorder_id
+            record.operation_id = workorder.operation_id
+            record.state = workorder.state
+            record.qty_production = workorder.qty_production
+            record.qty_produced = workorder.qty_produced
+            record.date_start = workorder.date_start
+            record.date_finished = workorder.date_finished
+
     @api.depends('state')
     def _compute_is_completed(self):
         for record in self:
@@ -818,6 +1245,102 @@ class WorkOrderOperationLine(models.Model):
             else:
                 record.progress_percentage = 0.0
 
+    @api.model
+    def _schedule_workorder_sync(self, workorder_ids):
+        """Copy the values of ``workorder_ids`` onto their operation lines
+        once, when the transaction commits"""
+        data = self.env.cr.precommit.data
+        pending = data.get('work.order.operation.line.sync')
+        if pending is None:
+            pending = data['work.order.operation.line.sync'] = set()
+            self.env.cr.precommit.add(self._run_workorder_sync)
+        pending.update(workorder_ids)
+
+    def _run_workorder_sync(self):
+        workorder_ids = self.env.cr.precommit.data.pop('work.order.operation.line.sync', set())
+        if workorder_ids:
+            self._sync_from_workorders(workorder_ids)
+
+    @api.model
+    def _sync_from_workorders(self, workorder_ids):
+        """Refresh the workorder values of the operation lines of
+        ``workorder_ids``, and the columns computed from them, with one
+        ``UPDATE ... FROM mrp_workorder``
+
+        :return: number of operation lines updated
+        """
+        self.env['mrp.workorder'].flush_model([
+            'production_id', 'operation_id', 'state', 'qty_produced', 'date_start', 'date_finished',
+        ])
+        self.env['mrp.production'].flush_model(['product_qty'])
+        self.flush_model(['workorder_id'])
+        self.env.cr.execute("""
+            UPDATE work_order_operation_line AS op
+               SET operation_id = wo.operation_id,
+                   state = wo.state,
+                   qty_production = mp.product_qty,
+                   qty_produced = wo.qty_produced,
+                   date_start = wo.date_start,
+                   date_finished = wo.date_finished,
+                   is_completed = wo.state IN ('done', 'cancel'),
+                   progress_percentage = CASE WHEN COALESCE(mp.product_qty, 0) != 0
+                                              THEN COALESCE(wo.qty_produced, 0) / mp.product_qty * 100
+                                              ELSE 0 END,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM mrp_workorder wo
+              JOIN mrp_production mp ON mp.id = wo.production_id
+             WHERE op.workorder_id = wo.id
+               AND wo.id = ANY(%s)
+               AND (op.operation_id, op.state, op.qty_production, op.qty_produced, op.date_start, op.date_finished)
+                   IS DISTINCT FROM
+                   (wo.operation_id, wo.state, mp.product_qty, wo.qty_produced, wo.date_start, wo.date_finished)
+        """, [self.env.uid, list(workorder_ids)])
+        count = self.env.cr.rowcount
+        self.invalidate_model([
+            'operation_id', 'state', 'qty_production', 'qty_produced', 'date_start', 'date_finished',
+            'is_completed', 'progress_percentage', 'write_uid', 'write_date',
+        ])
+        return count
+
+    @api.model
+    def _benchmark_workorder_sync(self, limit=1000):
+        """Time the per-line ORM recompute against :meth:`_sync_from_workorders`.
+
+        Both paths refresh the same stale operation lines, up to ``limit``,
+        each in a savepoint rolled back afterwards.
+
+        :return: dict with the line count and the duration of each path in seconds
+        """
+        lines = self.search([('workorder_id', '!=', False)], limit=limit)
+        workorder_ids = lines.workorder_id.ids
+        result = {'lines': len(lines)}
+        for path in ('orm', 'sql'):
+            try:
+                with self.env.cr.savepoint():
+                    # Stale lines, as after a workorder change
+                    self.env.cr.execute("""
+                        UPDATE work_order_operation_line
+                           SET state = NULL, qty_produced = NULL, date_start = NULL, date_finished = NULL
+                         WHERE id = ANY(%s)
+                    """, [lines.ids])
+                    self.invalidate_model()
+                    start = time.perf_counter()
+                    if path == 'orm':
+                        # What the related fields did on every workorder write
+                        for fname in WORKORDER_FIELDS:
+                            self.env.add_to_compute(self._fields[fname], lines)
+                        self.flush_model()
+                    else:
+                        self._sync_from_workorders(workorder_ids)
+                    result[path] = time.perf_counter() - start
+                    raise BenchmarkRollback()
+            except BenchmarkRollback:
+                pass
+        self.invalidate_model()
+        _logger.info('Operation line sync of %(lines)s lines: ORM %(orm).3fs, SQL %(sql).3fs', result)
+        return result
+
     def action_open_workorder(self):
         """Open the work order"""
         self.ensure_one()
@@ -832,17 +1355,37 @@ class WorkOrderOperationLine(models.Model):
             'target': 'current',
         }
 
+    def _transition_workorders(self, method_name, states):
+        """Call ``method_name`` on the workorders of the lines in ``states``, in one batch
+
+        :return: dict ``{line: (status, message)}``
+        """
+        ExecutionLine = self.env['work.order.execution.line']
+        to_move = self.filtered(lambda r: r.workorder_id and r.state in states)
+        failures = ExecutionLine._call_in_batch(to_move.workorder_id, method_name)
+        outcomes = {}
+        for record in self:
+            if not record.workorder_id:
+                outcomes[record] = ('skipped', _('No work order linked to this operation!'))
+            elif record not in to_move:
+                outcomes[record] = ('skipped', _('Operation is %s') % dict(
+                    self._fields['state']._description_selection(self.env)
+                ).get(record.state))
+            elif record.workorder_id.id in failures:
+                outcomes[record] = ('failed', failures[record.workorder_id.id])
+            else:
+                outcomes[record] = ('done', '')
+        return outcomes
+
     def action_start(self):
         """Start the work order"""
-        for record in self:
-            if record.workorder_id and record.state in ('pending', 'ready', 'waiting'):
-                record.workorder_id.button_start()
+        outcomes = self._transition_workorders('button_start', ('pending', 'ready', 'waiting'))
+        return self.env['work.order.execution.line']._notify_outcomes(_('Start Operations'), outcomes)
 
     def action_finish(self):
         """Finish the work order"""
-        for record in self:
-            if record.workorder_id and record.state in ('progress', 'to_close'):
-                record.workorder_id.button_finish()
+        outcomes = self._transition_workorders('button_finish', ('progress', 'to_close'))
+        return self.env['work.order.execution.line']._notify_outcomes(_('Finish Operations'), outcomes)
 
     def action_assign_resources(self):
         """Open wizard to assign workers and machines to selected operations"""
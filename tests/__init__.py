@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+from . import test_bom_explosion
+from . import test_work_order_creation
+from . import test_planning_job
+from . import test_work_order_execution
+from . import test_execution_changes
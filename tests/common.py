@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+
+class ProjectCostingCommon(TransactionCase):
+    """A finished product made of one component, whose BOM uses a
+    sub-assembly and a raw material, and a planning of 10 finished products.
+
+    * finished: 1 component per unit
+    * component: 1 sub-assembly and 3 raw B per unit, one operation
+    * sub-assembly: 2 raw A per unit
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super(ProjectCostingCommon, cls).setUpClass()
+        Product = cls.env['product.product']
+        cls.raw_a = Product.create({'name': 'Raw A', 'detailed_type': 'product'})
+        cls.raw_b = Product.create({'name': 'Raw B', 'detailed_type': 'product'})
+        cls.sub_assembly = Product.create({'name': 'Sub-assembly', 'detailed_type': 'product'})
+        cls.component = Product.create({'name': 'Component', 'detailed_type': 'product'})
+        cls.finished = Product.create({'name': 'Finished', 'detailed_type': 'product'})
+        cls.workcenter = cls.env['mrp.workcenter'].create({'name': 'Assembly'})
+
+        cls.sub_bom = cls._create_bom(cls.sub_assembly, [(cls.raw_a, 2.0)])
+        cls.component_bom = cls._create_bom(cls.component, [(cls.sub_assembly, 1.0), (cls.raw_b, 3.0)])
+        cls.finished_bom = cls._create_bom(cls.finished, [(cls.component, 1.0)])
+
+        partner = cls.env['res.partner'].create({'name': 'Customer', 'customer_rank': 1})
+        cls.project = cls.env['project.definition'].create({
+            'project_name': 'Project',
+            'partner_id': partner.id,
+            'end_date': fields.Date.add(fields.Date.today(), days=30),
+        })
+        cls.planning = cls.env['material.production.planning'].create({
+            'project_id': cls.project.id,
+            'product_id': cls.finished.id,
+            'quantity': 10.0,
+            'state': 'components_loaded',
+            'component_line_ids': [(0, 0, {
+                'component_id': cls.component.id,
+                'quantity': 10.0,
+                'bom_id': cls.component_bom.id,
+            })],
+        })
+
+    @classmethod
+    def _create_bom(cls, product, lines):
+        return cls.env['mrp.bom'].create({
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [(0, 0, {
+                'product_id': line_product.id,
+                'product_qty': quantity,
+            }) for line_product, quantity in lines],
+            'operation_ids': [(0, 0, {
+                'name': 'Assemble %s' % product.name,
+                'workcenter_id': cls.workcenter.id,
+                'time_cycle_manual': 10.0,
+            })],
+        })
+
+    @classmethod
+    def _create_orders(cls, quantity, **values):
+        """Run the work order creation wizard of the planning for ``quantity``"""
+        vals = {
+            'planning_id': cls.planning.id,
+            'product_id': cls.finished.id,
+            'max_quantity': cls.planning.quantity,
+            'quantity_to_produce': quantity,
+            'split_lots': False,
+        }
+        vals.update(values)
+        productions, message, has_shortages = cls.env['work.order.creation.wizard'].create(vals)._create_orders()
+        return productions
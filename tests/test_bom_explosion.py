@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+from unittest import skipIf
+
+from odoo.tests import tagged
+
+from odoo.addons.project_product_costing.models.bom_explosion import sparse
+from .common import ProjectCostingCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBomExplosion(ProjectCostingCommon):
+
+    def _explode(self, bom, **context):
+        Explosion = self.env['material.bom.explosion'].with_context(**context)
+        return {
+            material_id: qty
+            for material_id, (qty, dummy) in Explosion._explode_boms([bom.id])[bom.id].items()
+        }
+
+    def _cached_boms(self):
+        boms = self.finished_bom | self.component_bom | self.sub_bom
+        return self.env['mrp.bom.explosion.cache'].search([('bom_id', 'in', boms.ids)]).bom_id
+
+    def test_multi_level_explosion(self):
+        self.assertEqual(self._explode(self.finished_bom), {self.raw_a.id: 2.0, self.raw_b.id: 3.0})
+
+    def test_cache_is_stored_and_invalidated(self):
+        self._explode(self.finished_bom)
+        self.assertEqual(self._cached_boms(), self.finished_bom | self.component_bom | self.sub_bom)
+
+        # A sub-assembly change drops every explosion going through it
+        self.sub_bom.bom_line_ids.product_qty = 5.0
+        self.assertFalse(self._cached_boms())
+        self.assertEqual(self._explode(self.finished_bom), {self.raw_a.id: 5.0, self.raw_b.id: 3.0})
+
+    def test_cache_context(self):
+        self._explode(self.finished_bom, bom_explosion_cache='readonly')
+        self._explode(self.finished_bom, bom_explosion_cache=False)
+        self.assertFalse(self._cached_boms())
+
+    def test_hits_are_recorded_without_writing_the_cache(self):
+        Cache = self.env['mrp.bom.explosion.cache']
+        self._explode(self.component_bom)
+        cache = Cache.search([('bom_id', '=', self.component_bom.id)])
+        before = Cache._get_cache_statistics()['hits']
+
+        # A new run, without the in-memory memo, hits the stored cache
+        self._explode(self.component_bom)
+        self.assertEqual(Cache._get_cache_statistics()['hits'], before + 1)
+        self.assertEqual(cache.hit_count, 0)
+
+        Cache._gc_write_hit_counts()
+        self.assertEqual(cache.hit_count, 1)
+        self.assertFalse(self.env['mrp.bom.explosion.cache.hit'].search([('cache_id', '=', cache.id)]))
+        self.assertEqual(Cache._get_cache_statistics()['hits'], before + 1)
+
+    def test_portfolio_totals(self):
+        # 10 components, each made of 1 sub-assembly (2 raw A) and 3 raw B
+        expected = {self.raw_a.id: 20.0, self.raw_b.id: 30.0}
+        self.assertEqual(self.planning._get_portfolio_material_totals(backend='orm'), expected)
+
+    @skipIf(sparse is None, 'numpy/scipy not installed')
+    def test_matrix_backend_matches_orm(self):
+        totals = self.planning._get_portfolio_material_totals(backend='matrix')
+        self.assertEqual(set(totals), {self.raw_a.id, self.raw_b.id})
+        self.assertAlmostEqual(totals[self.raw_a.id], 20.0)
+        self.assertAlmostEqual(totals[self.raw_b.id], 30.0)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import HttpCase, tagged
+
+from .test_work_order_execution import WorkOrderExecutionCommon
+
+
+@tagged('post_install', '-at_install')
+class TestExecutionChanges(WorkOrderExecutionCommon, HttpCase):
+
+    def setUp(self):
+        super(TestExecutionChanges, self).setUp()
+        self.authenticate('admin', 'admin')
+        self.url = '/project_product_costing/execution/%s/changes' % self.execution.id
+        self.env.flush_all()
+        self.env.cr.execute("SELECT txid_current()")
+        self.txid = self.env.cr.fetchone()[0]
+
+    def test_changes(self):
+        operations = self.execution.work_order_line_ids.operation_line_ids
+        response = self.url_open(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['line_ids'], sorted(self.execution.work_order_line_ids.ids))
+        self.assertEqual(data['operation_ids'], sorted(operations.ids))
+        self.assertEqual(sorted(line['id'] for line in data['lines']), sorted(self.execution.work_order_line_ids.ids))
+        self.assertEqual(sorted(op['id'] for op in data['operations']), sorted(operations.ids))
+        # This transaction is still running: the watermark must not skip it
+        self.assertLessEqual(data['watermark'], self.txid)
+
+        response = self.url_open(self.url, headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_no_changes_after_the_watermark(self):
+        data = self.url_open('%s?since=%s' % (self.url, self.txid + 1)).json()
+        self.assertFalse(data['execution'])
+        self.assertEqual(data['lines'], [])
+        self.assertEqual(data['operations'], [])
+
+    def test_deleted_operations(self):
+        operations = self.execution.work_order_line_ids.operation_line_ids
+        operations[:1].unlink()
+        self.env.flush_all()
+        data = self.url_open(self.url).json()
+        self.assertEqual(data['operation_ids'], sorted(operations[1:].ids))
+
+    def test_invalid_watermark(self):
+        self.assertEqual(self.url_open('%s?since=yesterday' % self.url).status_code, 400)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+from psycopg2 import OperationalError
+from psycopg2 import errorcodes
+
+from odoo.exceptions import AccessError
+from odoo.tests import tagged
+
+from odoo.addons.project_product_costing.models.planning_job import JOB_MAX_RETRIES
+from .common import ProjectCostingCommon
+
+
+class SerializationFailure(OperationalError):
+    """What PostgreSQL raises when a concurrent transaction won"""
+    pgcode = errorcodes.SERIALIZATION_FAILURE
+
+
+@tagged('post_install', '-at_install')
+class TestPlanningJob(ProjectCostingCommon):
+
+    def setUp(self):
+        super(TestPlanningJob, self).setUp()
+        # Jobs commit their work; here it stays in the test transaction
+        self.patch(self.env.cr, 'commit', lambda: None)
+        self.patch(self.env.cr, 'rollback', lambda: None)
+
+    def _enqueue_create_orders(self, quantity):
+        return self.env['planning.job']._enqueue(
+            self.env['work.order.creation.wizard'], '_job_create_orders', 'Create Orders',
+            values={
+                'planning_id': self.planning.id,
+                'product_id': self.finished.id,
+                'max_quantity': self.planning.quantity,
+                'quantity_to_produce': quantity,
+                'create_component_orders': True,
+                'confirm_orders': True,
+                'split_lots': False,
+                'ignore_material_shortage': True,
+            },
+        )
+
+    def test_run_job(self):
+        job = self._enqueue_create_orders(4.0)
+        self.assertEqual(job.state, 'pending')
+        job._run()
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.progress, 100.0)
+        self.assertEqual(self.planning.production_order_ids.product_id, self.finished | self.component)
+        # The progress of a job creating orders all at once goes on the bus
+        self.assertTrue(self.env['bus.bus'].sudo().search([
+            ('message', 'like', 'project_product_costing.job_progress'),
+        ]))
+
+    def test_run_only_allowed_methods(self):
+        partner = self.env['res.partner'].create({'name': 'Not a job'})
+        job = self.env['planning.job']._enqueue(partner, 'unlink', 'Delete')
+        job._run()
+        self.assertEqual(job.state, 'failed')
+        self.assertTrue(partner.exists())
+
+    def test_retry_on_serialization_failure(self):
+        def lose_the_lock(wizard):
+            raise SerializationFailure('could not serialize access due to concurrent update')
+
+        job = self._enqueue_create_orders(4.0)
+        self.patch(type(self.env['work.order.creation.wizard']), '_create_orders', lose_the_lock)
+        job._run()
+        self.assertEqual(job.state, 'pending')
+        self.assertEqual(job.retry_count, 1)
+
+        job.retry_count = JOB_MAX_RETRIES
+        job._run()
+        self.assertEqual(job.state, 'failed')
+
+    def test_users_manage_their_own_jobs(self):
+        user = self.env['res.users'].create({
+            'name': 'Planner',
+            'login': 'planner',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])],
+        })
+        own_job = self._enqueue_create_orders(4.0).with_user(user)
+        own_job.sudo().user_id = user
+        other_job = self._enqueue_create_orders(4.0).with_user(user)
+
+        own_job.action_cancel()
+        self.assertEqual(own_job.state, 'cancelled')
+        with self.assertRaises(AccessError):
+            other_job.action_cancel()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.tools import float_compare
+
+from .common import ProjectCostingCommon
+
+
+@tagged('post_install', '-at_install')
+class TestWorkOrderCreation(ProjectCostingCommon):
+
+    def test_split_lots_add_up(self):
+        Wizard = self.env['work.order.creation.wizard']
+        for quantity, max_batch_size, rounding in [
+            (10.0, 3.0, 1.0),
+            (7.35, 2.0, 0.01),
+            (1.0, 0.3, 0.01),
+            (0.3, 0.1, 0.001),
+            (100.0, 7.0, 0.5),
+        ]:
+            with self.subTest(quantity=quantity, max_batch_size=max_batch_size, rounding=rounding):
+                lots = Wizard._split_lots(quantity, max_batch_size, rounding)
+                self.assertEqual(float_compare(sum(lots), quantity, precision_rounding=rounding), 0)
+                self.assertTrue(all(float_compare(lot, 0.0, precision_rounding=rounding) > 0 for lot in lots))
+                self.assertTrue(all(
+                    float_compare(lot, max_batch_size, precision_rounding=rounding) <= 0 for lot in lots
+                ))
+
+    def test_split_lots_under_the_limit(self):
+        self.assertEqual(self.env['work.order.creation.wizard']._split_lots(5.0, 10.0, 1.0), [5.0])
+
+    def test_create_orders(self):
+        productions = self._create_orders(4.0)
+        self.assertEqual(productions.product_id, self.finished | self.component)
+        self.assertEqual(self.planning.production_order_ids, productions)
+        self.assertEqual(self.planning.state, 'work_orders_created')
+        self.assertEqual(set(productions.mapped('state')), {'confirmed'})
+
+    def test_create_orders_without_confirmation(self):
+        productions = self._create_orders(4.0, confirm_orders=False)
+        self.assertEqual(set(productions.mapped('state')), {'draft'})
+
+    def test_component_quantities_up_to_the_planned_quantity(self):
+        # 0.1 + 0.2 is not exactly 0.3 in floating point
+        self.planning.write({'quantity': 3.0})
+        self.planning.component_line_ids.quantity = 0.3
+        self._create_orders(1.0)
+        self._create_orders(2.0)
+        with self.assertRaises(UserError):
+            self._create_orders(1.0, max_quantity=1.0)
+
+    def test_lock_survives_savepoints(self):
+        self.planning._lock_for_production()
+        with self.env.cr.savepoint():
+            pass
+        self.env.cr.flush()
+        self.assertIn(self.planning.id, self.env.cr.postcommit.data['material.production.planning.locked'])
+
+        # Holding the lock, a job only reports its progress
+        Job = self.env['planning.job'].with_context(planning_job_id=self.env['planning.job'].create({
+            'name': 'Locked job',
+            'model_name': 'work.order.creation.wizard',
+            'method_name': '_job_create_orders',
+        }).id)
+        with patch.object(self.env.cr, 'commit', side_effect=AssertionError('committed under the lock')), \
+                patch.object(type(Job), '_report_progress') as report_progress:
+            Job._commit_progress(1, 2)
+        report_progress.assert_called_once_with(1, 2)
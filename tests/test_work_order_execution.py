@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import ProjectCostingCommon
+
+
+class WorkOrderExecutionCommon(ProjectCostingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super(WorkOrderExecutionCommon, cls).setUpClass()
+        cls.productions = cls._create_orders(4.0)
+        cls.execution = cls.env['work.order.execution'].create({
+            'project_id': cls.project.id,
+            'product_id': cls.finished.id,
+        })
+        cls.execution.action_load_work_orders()
+
+    def _line(self, production):
+        return self.execution.work_order_line_ids.filtered(lambda l: l.production_id == production)
+
+
+@tagged('post_install', '-at_install')
+class TestWorkOrderExecution(WorkOrderExecutionCommon):
+
+    def test_load_work_orders(self):
+        self.assertEqual(self.execution.state, 'loaded')
+        self.assertEqual(self.execution.work_order_line_ids.production_id, self.productions)
+        operations = self.execution.work_order_line_ids.operation_line_ids
+        self.assertEqual(operations.workorder_id, self.productions.workorder_ids)
+        for line in self.execution.work_order_line_ids:
+            self.assertEqual(line.total_count, len(line.production_id.workorder_ids))
+            self.assertEqual(line.done_count, 0)
+
+    def test_sync_adds_and_removes_lines(self):
+        operation = self.execution.work_order_line_ids.operation_line_ids[:1]
+        operation.actual_duration = 42.0
+        drafts = self._create_orders(2.0, confirm_orders=False)
+
+        stats = self.execution._sync_work_orders()
+        self.assertEqual(stats['added'], len(drafts))
+        self.assertEqual(stats['removed'], 0)
+        self.assertEqual(self.execution.work_order_line_ids.production_id, self.productions | drafts)
+        # The sync never confirms what the user chose to keep as draft
+        self.assertEqual(set(drafts.mapped('state')), {'draft'})
+        # The lines already loaded are kept with their actuals
+        self.assertEqual(operation.actual_duration, 42.0)
+
+        removed = self.productions[:1]
+        self.planning.production_order_ids = [(3, removed.id)]
+        stats = self.execution._sync_work_orders()
+        self.assertEqual(stats['removed'], 1)
+        self.assertFalse(self._line(removed))
+
+    def test_sync_without_changes(self):
+        lines = self.execution.work_order_line_ids
+        stats = self.execution._sync_work_orders()
+        self.assertEqual(stats, {'added': 0, 'removed': 0, 'operations': 0})
+        self.assertEqual(self.execution.work_order_line_ids, lines)
+
+    def test_workorder_changes_reach_the_lines_at_commit(self):
+        production = self.productions.filtered(lambda p: p.product_id == self.component)
+        workorder = production.workorder_ids[:1]
+        line = self._line(production)
+        operation = line.operation_line_ids.filtered(lambda o: o.workorder_id == workorder)
+
+        workorder.button_start()
+        # The operation lines and counters are updated once, before the commit
+        self.env.cr.flush()
+        self.assertEqual(operation.state, 'progress')
+        self.assertEqual(line.current_operation, workorder.name)
+
+        workorder.button_finish()
+        self.env.cr.flush()
+        self.assertEqual(operation.state, 'done')
+        self.assertTrue(operation.is_completed)
+        self.assertEqual(line.done_count, 1)
+
+    def test_updates_stamp_the_change_counter(self):
+        cr = self.env.cr
+        operation = self.execution.work_order_line_ids.operation_line_ids[:1]
+        cr.execute("ALTER TABLE work_order_operation_line DISABLE TRIGGER work_order_operation_line_stamp_change")
+        cr.execute("UPDATE work_order_operation_line SET change_txid = 0 WHERE id = %s", [operation.id])
+        cr.execute("ALTER TABLE work_order_operation_line ENABLE TRIGGER work_order_operation_line_stamp_change")
+
+        operation.actual_duration = 12.0
+        self.env.flush_all()
+        cr.execute("""
+            SELECT change_txid = txid_current() FROM work_order_operation_line WHERE id = %s
+        """, [operation.id])
+        self.assertTrue(cr.fetchone()[0])
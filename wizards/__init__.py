@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from . import material_requirement_wizard
+from . import material_planning_simulation_wizard
 from . import import_components_wizard
 from . import work_order_creation_wizard
 from . import import_separate_wizards
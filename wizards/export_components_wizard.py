@@ -29,6 +29,12 @@ class ExportComponentsWizard(models.TransientModel):
         default=True,
         help='Include BOM materials and operations in separate sheets'
     )
+    flatten_bom_materials = fields.Boolean(
+        string='Flatten BOM Materials',
+        default=False,
+        help='List the leaf materials of every sub-assembly, per unit of component, '
+             'instead of the direct BOM lines'
+    )
     
     def action_export(self):
         """Export components to Excel with specifications"""
@@ -235,6 +241,8 @@ class ExportComponentsWizard(models.TransientModel):
         
         # Headers
         headers = ['BOM Code', 'Material Name', 'Quantity', 'Unit']
+        if self.flatten_bom_materials:
+            headers[2] = 'Quantity per Unit'
         
         for col_num, header in enumerate(headers, 1):
             cell = ws.cell(row=1, column=col_num)
@@ -251,6 +259,10 @@ class ExportComponentsWizard(models.TransientModel):
         ws.column_dimensions['D'].width = 10
         
         # Data
+        if self.flatten_bom_materials:
+            self._write_flattened_bom_materials(ws, border)
+            return
+        
         row_num = 2
         for component in self.pricing_id.component_line_ids:
             if component.bom_id and component.bom_id.bom_line_ids:
@@ -271,6 +283,38 @@ class ExportComponentsWizard(models.TransientModel):
                     
                     row_num += 1
     
+    def _write_flattened_bom_materials(self, ws, border):
+        """Write the leaf materials of the component BOMs from the explosion cache"""
+        components = self.pricing_id.component_line_ids.filtered('bom_id')
+        explosions = self.env['material.bom.explosion']._explode_boms(components.bom_id.ids)
+        materials = self.env['product.product'].browse({
+            material_id
+            for leaves in explosions.values()
+            for material_id in leaves
+        })
+        
+        row_num = 2
+        for component in components:
+            bom_code = component.bom_id.code or f'BOM-{component.bom_id.id}'
+            leaves = explosions.get(component.bom_id.id, {})
+            for material in materials.filtered(lambda m: m.id in leaves):
+                qty_per_unit, dummy = leaves[material.id]
+                
+                ws.cell(row=row_num, column=1).value = bom_code
+                ws.cell(row=row_num, column=1).border = border
+                
+                ws.cell(row=row_num, column=2).value = material.name
+                ws.cell(row=row_num, column=2).border = border
+                
+                ws.cell(row=row_num, column=3).value = qty_per_unit
+                ws.cell(row=row_num, column=3).border = border
+                ws.cell(row=row_num, column=3).number_format = '0.0000'
+                
+                ws.cell(row=row_num, column=4).value = material.uom_id.name
+                ws.cell(row=row_num, column=4).border = border
+                
+                row_num += 1
+    
     def _create_bom_operations_sheet(self, wb):
         """Create BOM Operations sheet"""
         ws = wb.create_sheet('BOM Operations')
@@ -591,8 +591,8 @@ Columns: BOM Code | Operation Name | Workcenter | Duration (min) | Workers Neede
         
         return stats
     
-    def _find_or_create_product(self, product_name, cost_price=0.0):
-        """Find existing product or create new one"""
+    def _find_or_create_product(self, product_name, cost_price=0.0, uom=None):
+        """Find existing product or create new one, in ``uom`` if given"""
         # Try to find existing product
         product = self.env['product.product'].search([
             '|', ('name', '=', product_name),
@@ -605,14 +605,17 @@ Columns: BOM Code | Operation Name | Workcenter | Duration (min) | Workers Neede
         # Auto-create if enabled
         if self.create_missing_products:
             try:
-                product = self.env['product.product'].create({
+                product_vals = {
                     'name': product_name,
                     'type': 'product',
                     'standard_price': cost_price,
                     'list_price': cost_price * 1.3,  # 30% markup
                     'detailed_type': 'product',
                     'categ_id': self.env.ref('product.product_category_all').id,
-                })
+                }
+                if uom:
+                    product_vals.update(uom_id=uom.id, uom_po_id=uom.id)
+                product = self.env['product.product'].create(product_vals)
                 _logger.info('Auto-created product: %s', product_name)
                 return product
             except Exception as e:
@@ -622,6 +625,15 @@ Columns: BOM Code | Operation Name | Workcenter | Duration (min) | Workers Neede
             _logger.warning('Product not found and auto-create disabled: %s', product_name)
             return None
     
+    def _get_bom_line_uom(self, product, uom, unit):
+        """Unit of a BOM line: the imported unit when it is compatible with the
+        product's unit, so the planning converts it, else the product's unit"""
+        if uom and uom.category_id == product.uom_id.category_id:
+            return uom
+        if unit:
+            _logger.warning('Unit %s not usable for %s, using %s', unit, product.name, product.uom_id.name)
+        return product.uom_id
+    
     def _find_or_create_workcenter(self, workcenter_name):
         """Find existing workcenter or create new one"""
         # Try to find existing workcenter
@@ -672,8 +684,13 @@ Columns: BOM Code | Operation Name | Workcenter | Duration (min) | Workers Neede
             
             # Create BOM lines (materials)
             bom_lines = []
+            uoms = {}
             for mat in materials:
-                material_product = self._find_or_create_product(mat['material'])
+                unit = mat.get('unit')
+                if unit not in uoms:
+                    uoms[unit] = self.env['uom.uom']._find_from_text(unit)
+                uom = uoms[unit]
+                material_product = self._find_or_create_product(mat['material'], uom=uom)
                 
                 if material_product:
                     # Check if this is a newly created product
@@ -685,6 +702,7 @@ Columns: BOM Code | Operation Name | Workcenter | Duration (min) | Workers Neede
                     bom_lines.append((0, 0, {
                         'product_id': material_product.id,
                         'product_qty': mat['quantity'],
+                        'product_uom_id': self._get_bom_line_uom(material_product, uom, unit).id,
                     }))
             
             # Create routing operations
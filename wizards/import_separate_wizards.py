@@ -394,6 +394,7 @@ Steel Sheet | Steel Raw Material | 6 | kg
 
             boms_created = 0
             materials_created = 0
+            uoms = {}
 
             for component_name, materials in component_materials.items():
                 # Find component
@@ -409,6 +410,11 @@ Steel Sheet | Steel Raw Material | 6 | kg
                 # Create BOM
                 bom_lines = []
                 for mat in materials:
+                    unit = mat['unit']
+                    if unit not in uoms:
+                        uoms[unit] = self.env['uom.uom']._find_from_text(unit)
+                    uom = uoms[unit]
+
                     # Find or create material
                     material = self.env['product.product'].search([
                         '|', ('name', '=', mat['material']),
@@ -416,15 +422,24 @@ Steel Sheet | Steel Raw Material | 6 | kg
                     ], limit=1)
 
                     if not material:
-                        material = self.env['product.product'].create({
+                        material_vals = {
                             'name': mat['material'],
                             'type': 'product',
-                        })
+                        }
+                        if uom:
+                            material_vals.update(uom_id=uom.id, uom_po_id=uom.id)
+                        material = self.env['product.product'].create(material_vals)
                         materials_created += 1
 
+                    # Keep the imported unit when compatible, the planning
+                    # converts it to the material's stock unit
+                    if not uom or uom.category_id != material.uom_id.category_id:
+                        uom = material.uom_id
+
                     bom_lines.append((0, 0, {
                         'product_id': material.id,
                         'product_qty': mat['quantity'],
+                        'product_uom_id': uom.id,
                     }))
 
                 if bom_lines:
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+from markupsafe import Markup, escape
+
+from odoo import models, fields, api, _
+
+
+class MaterialPlanningSimulationWizard(models.TransientModel):
+    _name = 'material.planning.simulation.wizard'
+    _description = 'Material Planning Simulation'
+
+    planning_id = fields.Many2one(
+        'material.production.planning',
+        string='Planning',
+        required=True,
+        readonly=True
+    )
+    planned_quantity = fields.Float(
+        string='Planned Quantity',
+        related='planning_id.quantity',
+        readonly=True
+    )
+    quantity = fields.Float(
+        string='Simulated Quantity',
+        digits='Product Unit of Measure',
+        help='Product quantity to simulate, component quantities are scaled accordingly'
+    )
+    compare_with_plan = fields.Boolean(
+        string='Compare with Stored Plan',
+        default=True,
+        help='Highlight the differences with the current material requirements'
+    )
+
+    shortage_count = fields.Integer(
+        string='Materials Short',
+        compute='_compute_simulation'
+    )
+    diff_summary = fields.Char(
+        string='Changes',
+        compute='_compute_simulation'
+    )
+    result_html = fields.Html(
+        string='Simulated Requirements',
+        compute='_compute_simulation',
+        sanitize=False
+    )
+
+    @api.depends('planning_id', 'quantity', 'compare_with_plan')
+    def _compute_simulation(self):
+        """Recomputed on every quantity change: the simulation writes nothing"""
+        for wizard in self:
+            if not wizard.planning_id or not wizard.planning_id.component_line_ids:
+                wizard.shortage_count = 0
+                wizard.diff_summary = False
+                wizard.result_html = False
+                continue
+
+            planning = wizard.planning_id._origin
+            result = planning.simulate_material_planning(
+                quantities={planning.id: wizard.quantity},
+                compare=wizard.compare_with_plan,
+            )[planning.id]
+
+            requirements = result['requirements']
+            wizard.shortage_count = len({
+                vals['material_id'] for vals in requirements if vals['shortage_qty'] > 0
+            })
+            diff = result.get('diff')
+            wizard.diff_summary = diff and planning._format_sync_stats(diff['stats'])
+            wizard.result_html = wizard._render_simulation(requirements, diff)
+
+    def _render_simulation(self, requirements, diff=None):
+        """HTML table of the simulated requirement lines"""
+        products = self.env['product.product'].browse(
+            {vals['material_id'] for vals in requirements}
+            | {vals['component_id'] for vals in requirements if vals.get('component_id')}
+        )
+        names = {product.id: product.display_name for product in products}
+        uoms = {product.id: product.uom_id.name for product in products}
+
+        stored = {}
+        if diff:
+            for line in self.planning_id.material_requirement_ids:
+                stored[line.component_id.id, line.material_id.id] = line.shortage_qty
+
+        rows = []
+        for vals in sorted(requirements, key=lambda v: (names.get(v.get('component_id'), ''), names[v['material_id']])):
+            key = (vals.get('component_id') or False, vals['material_id'])
+            row_class = 'table-danger' if vals['shortage_qty'] > 0 else ''
+            if diff and key not in stored:
+                stored_cell = _('New')
+                row_class = row_class or 'table-info'
+            elif diff:
+                stored_cell = '%.2f' % stored[key]
+            else:
+                stored_cell = ''
+            cells = [
+                names.get(vals.get('component_id'), ''),
+                names[vals['material_id']],
+                '%.2f %s' % (vals['required_qty'], uoms[vals['material_id']]),
+                '%.2f' % vals['allocated_qty'],
+                '%.2f' % vals['shortage_qty'],
+                vals['need_date'] and fields.Date.to_string(vals['need_date']) or '',
+            ]
+            if diff:
+                cells.append(stored_cell)
+            rows.append(Markup('<tr class="%s">%s</tr>') % (
+                row_class,
+                Markup('').join(Markup('<td>%s</td>') % cell for cell in cells),
+            ))
+
+        headers = [_('Component'), _('Material'), _('Required'), _('Allocated'), _('Shortage'), _('Need Date')]
+        if diff:
+            headers.append(_('Stored Shortage'))
+        html = Markup(
+            '<table class="table table-sm table-striped o_material_simulation">'
+            '<thead><tr>%s</tr></thead><tbody>%s</tbody></table>'
+        ) % (
+            Markup('').join(Markup('<th>%s</th>') % header for header in headers),
+            Markup('').join(rows),
+        )
+        if diff and diff['deleted']:
+            html += Markup('<p class="text-muted">%s</p>') % escape(
+                _('%s stored requirement lines would be removed.') % len(diff['deleted'])
+            )
+        return html
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+from datetime import timedelta
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
@@ -14,6 +16,12 @@ class MaterialRequirementWizard(models.TransientModel):
         required=True
     )
     
+    sync_summary = fields.Char(
+        string='Last Planning Run',
+        readonly=True,
+        help='Requirement lines created, updated and deleted by the last planning run'
+    )
+    
     material_line_ids = fields.One2many(
         related='planning_id.material_requirement_ids',
         string='Material Requirements',
@@ -31,30 +39,42 @@ class MaterialRequirementWizard(models.TransientModel):
         if not shortage_lines:
             raise UserError(_('No material shortage found!'))
         
-        # Group by product to avoid duplicate lines
-        product_qty_map = {}
-        for line in shortage_lines:
-            if line.material_id.id in product_qty_map:
-                product_qty_map[line.material_id.id] += line.shortage_qty
-            else:
-                product_qty_map[line.material_id.id] = line.shortage_qty
+        # Shortages are netted per component, so their sum per material and
+        # week is the quantity to buy; each week is delivered when needed
+        start_date, buckets = shortage_lines._get_time_buckets(bucket_days=7)
+        today = fields.Date.context_today(self)
+        undated_qty = {}
+        for line in shortage_lines.filtered(lambda l: not l.need_date):
+            undated_qty[line.material_id.id] = undated_qty.get(line.material_id.id, 0.0) + line.shortage_qty
         
         # Create RFQ
         po_lines = []
-        for product_id, qty in product_qty_map.items():
-            product = self.env['product.product'].browse(product_id)
-            
+        Uom = self.env['uom.uom']
+        uom_factors = Uom._get_factor_table()
+        products = self.env['product.product'].browse(set(buckets) | set(undated_qty))
+        for product in products:
             # Find supplier
             supplier_info = product.seller_ids[:1]
             
-            po_lines.append((0, 0, {
-                'product_id': product_id,
-                'product_qty': qty,
-                'product_uom': product.uom_po_id.id,
-                'price_unit': supplier_info.price if supplier_info else product.standard_price,
-                'name': product.name,
-                'date_planned': fields.Datetime.now(),
-            }))
+            deliveries = []
+            if product.id in undated_qty:
+                deliveries.append((today, undated_qty[product.id]))
+            for index, qty in enumerate(buckets.get(product.id, [])):
+                if qty > 0:
+                    deliveries.append((max(start_date + timedelta(days=7 * index), today), qty))
+            
+            for date_planned, qty in deliveries:
+                # Shortages are in the stock unit, RFQs in the purchase unit
+                po_lines.append((0, 0, {
+                    'product_id': product.id,
+                    'product_qty': Uom._convert_with_table(
+                        uom_factors, qty, product.uom_id.id, product.uom_po_id.id
+                    ),
+                    'product_uom': product.uom_po_id.id,
+                    'price_unit': supplier_info.price if supplier_info else product.standard_price,
+                    'name': product.name,
+                    'date_planned': fields.Datetime.to_datetime(date_planned),
+                }))
         
         # Get default supplier or create without supplier
         default_supplier = False
@@ -64,6 +84,8 @@ class MaterialRequirementWizard(models.TransientModel):
         purchase_order = self.env['purchase.order'].create({
             'partner_id': default_supplier if default_supplier else self.env.ref('base.main_partner').id,
             'origin': self.planning_id.name,
+            'planning_id': self.planning_id.id,
+            'project_definition_id': self.planning_id.project_id.id,
             'order_line': po_lines,
         })
         
@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import json
+import math
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import float_compare, float_round
+
+# Production orders created and confirmed per batch
+PRODUCTION_CHUNK_SIZE = 50
 
 
 class WorkOrderCreationWizard(models.TransientModel):
@@ -37,6 +44,25 @@ class WorkOrderCreationWizard(models.TransientModel):
         help='Also create work orders for components'
     )
     
+    confirm_orders = fields.Boolean(
+        string='Confirm Orders',
+        default=True,
+        help='Confirm the created production orders, all in one batch'
+    )
+    
+    split_lots = fields.Boolean(
+        string='Split in Lots',
+        default=True,
+        help='Split orders above the max batch size of the product or of its work centers '
+             'in balanced lots that can run in parallel'
+    )
+    
+    run_in_background = fields.Boolean(
+        string='Run in Background',
+        default=False,
+        help='Create the orders in a background job, recommended for large plannings'
+    )
+    
     ignore_material_shortage = fields.Boolean(
         string='Create Even Without Materials',
         default=True,
@@ -55,7 +81,70 @@ class WorkOrderCreationWizard(models.TransientModel):
         store=False
     )
     
-    @api.depends('planning_id', 'quantity_to_produce')
+    preview_cache = fields.Text(
+        string='Preview Cache',
+        compute='_compute_preview_cache',
+        store=True,
+        readonly=True,
+        help='Components, BOMs, batch limits and shortages of the planning, '
+             'loaded once when the wizard opens'
+    )
+    
+    component_preview = fields.Text(
+        string='Component Preview',
+        readonly=True,
+        compute='_compute_component_preview',
+        store=False
+    )
+    
+    @api.depends('planning_id')
+    def _compute_preview_cache(self):
+        """Walk the planning once; the previews only rescale these numbers"""
+        for wizard in self:
+            planning = wizard.planning_id._origin
+            if not planning:
+                wizard.preview_cache = False
+                continue
+            
+            components = planning.component_line_ids.filtered('bom_id')
+            # Leaf materials come from the shared explosion cache
+            explosions = self.env['material.bom.explosion']._explode_boms(components.bom_id.ids)
+            limits = wizard._get_batch_limits([(comp.component_id, comp.bom_id) for comp in components])
+            
+            wizard.preview_cache = json.dumps({
+                'planning_id': planning.id,
+                'quantity': planning.quantity,
+                'components': [{
+                    'name': comp.component_id.name,
+                    'quantity': comp.quantity,
+                    'bom': comp.bom_id.code or comp.bom_id.id,
+                    'materials': len(explosions.get(comp.bom_id.id, {})),
+                    'limit': limits[comp.component_id.id, comp.bom_id.id],
+                    'rounding': comp.component_id.uom_id.rounding,
+                } for comp in components],
+                # The wizard never produces more than planned, so the lines
+                # short at the planned quantity are the only candidates
+                'shortages': [{
+                    'name': line.material_id.name,
+                    'required': line.required_qty,
+                    'available': line.available_qty,
+                    'allocated': line.allocated_qty,
+                    'uom': line.uom_id.name,
+                } for line in planning.material_requirement_ids if line.shortage_qty > 0],
+            })
+    
+    def _get_preview_data(self):
+        """Cached preview data and the ratio of the quantity to produce to the planned one"""
+        self.ensure_one()
+        data = json.loads(self.preview_cache or '{}')
+        if data.get('planning_id') != self.planning_id._origin.id:
+            # Opened without going through create, e.g. from a new record
+            self._compute_preview_cache()
+            data = json.loads(self.preview_cache or '{}')
+        ratio = self.quantity_to_produce / data['quantity'] if data.get('quantity', 0) > 0 else 1
+        return data, ratio
+    
+    @api.depends('preview_cache', 'quantity_to_produce')
     def _compute_material_warning(self):
         """Check material availability and show warning"""
         for wizard in self:
@@ -64,23 +153,25 @@ class WorkOrderCreationWizard(models.TransientModel):
                 wizard.material_warning_message = ''
                 continue
             
-            # Check for material shortages
-            shortages = wizard.planning_id.material_requirement_ids.filtered(
-                lambda l: l.shortage_qty > 0
-            )
-            
-            if shortages:
-                warning_lines = ['⚠️ Material Shortages Detected:\n']
-                for shortage in shortages:
-                    warning_lines.append(
-                        '• %s: Need %.2f, Have %.2f, Short %.2f %s' % (
-                            shortage.material_id.name,
-                            shortage.required_qty,
-                            shortage.available_qty,
-                            shortage.shortage_qty,
-                            shortage.uom_id.name
-                        )
+            data, ratio = wizard._get_preview_data()
+            warning_lines = []
+            for shortage in data.get('shortages', []):
+                required = shortage['required'] * ratio
+                short = required - shortage['allocated']
+                if short <= 0:
+                    continue
+                warning_lines.append(
+                    '• %s: Need %.2f, Have %.2f, Short %.2f %s' % (
+                        shortage['name'],
+                        required,
+                        shortage['available'],
+                        short,
+                        shortage['uom']
                     )
+                )
+            
+            if warning_lines:
+                warning_lines.insert(0, '⚠️ Material Shortages Detected:\n')
                 warning_lines.append('\n✅ Work orders will be created anyway.')
                 warning_lines.append('📋 You can create RFQs for missing materials from Material Planning.')
                 
@@ -90,51 +181,253 @@ class WorkOrderCreationWizard(models.TransientModel):
                 wizard.show_material_warning = False
                 wizard.material_warning_message = '✅ All materials available in stock.'
     
-    @api.onchange('quantity_to_produce', 'planning_id', 'create_component_orders')
-    def _onchange_quantity_preview(self):
-        """Update component preview when quantity changes"""
-        if self.planning_id and self.quantity_to_produce > 0:
-            ratio = self.quantity_to_produce / self.planning_id.quantity if self.planning_id.quantity > 0 else 1
-            
-            preview_text = _("Component Orders to Create:\n\n")
-            for comp in self.planning_id.component_line_ids:
-                if comp.bom_id:
-                    component_qty = comp.quantity * ratio
-                    preview_text += _("• %s: %.2f units (BOM: %s)\n") % (
-                        comp.component_id.name,
-                        component_qty,
-                        comp.bom_id.code or comp.bom_id.id
-                    )
-            
-            self.component_preview = preview_text if preview_text != _("Component Orders to Create:\n\n") else _("No components with BOM found")
-    
-    component_preview = fields.Text(
-        string='Component Preview',
-        readonly=True,
-        compute='_compute_component_preview',
-        store=False
-    )
-    
-    @api.depends('quantity_to_produce', 'planning_id')
+    @api.depends('preview_cache', 'quantity_to_produce', 'split_lots')
     def _compute_component_preview(self):
         for wizard in self:
             if wizard.planning_id and wizard.quantity_to_produce > 0:
-                ratio = wizard.quantity_to_produce / wizard.planning_id.quantity if wizard.planning_id.quantity > 0 else 1
+                data, ratio = wizard._get_preview_data()
                 
                 preview_text = _("Component Orders to Create:\n\n")
-                for comp in wizard.planning_id.component_line_ids:
-                    if comp.bom_id:
-                        component_qty = comp.quantity * ratio
-                        preview_text += _("• %s: %.2f units (BOM: %s)\n") % (
-                            comp.component_id.name,
-                            component_qty,
-                            comp.bom_id.code or comp.bom_id.id
-                        )
+                for comp in data.get('components', []):
+                    component_qty = comp['quantity'] * ratio
+                    preview_text += _("• %s: %.2f units (BOM: %s, %d materials)\n") % (
+                        comp['name'],
+                        component_qty,
+                        comp['bom'],
+                        comp['materials']
+                    )
+                    if wizard.split_lots:
+                        preview_text += wizard._format_lot_split(component_qty, comp['limit'], comp['rounding'])
                 
-                wizard.component_preview = preview_text if preview_text != _("Component Orders to Create:\n\n") else _("No components with BOM found")
+                wizard.component_preview = preview_text if data.get('components') else _("No components with BOM found")
             else:
                 wizard.component_preview = _("Enter quantity to see component preview")
     
+    @api.model
+    def _get_batch_limits(self, product_boms):
+        """Max batch size of each product and what sets it.
+        
+        The product's own limit wins, else the smallest limit of the work
+        centers its BOM operations run on.
+        
+        :param product_boms: list of ``(product, bom)``, ``bom`` may be empty
+        :return: dict ``{(product_id, bom_id): (max batch size, limited by)}``,
+            a size of 0 meaning no limit
+        """
+        limits = {}
+        for product, bom in product_boms:
+            if product.max_batch_size > 0:
+                limits[product.id, bom.id] = (product.max_batch_size, product.display_name)
+                continue
+            sizes = [
+                (workcenter.max_batch_size, workcenter.name)
+                for workcenter in bom.operation_ids.workcenter_id
+                if workcenter.max_batch_size > 0
+            ]
+            limits[product.id, bom.id] = min(sizes) if sizes else (0.0, False)
+        return limits
+    
+    @api.model
+    def _split_lots(self, quantity, max_batch_size, rounding):
+        """Split ``quantity`` in the fewest balanced lots not above ``max_batch_size``"""
+        if max_batch_size <= 0 or float_compare(quantity, max_batch_size, precision_rounding=rounding) <= 0:
+            return [quantity]
+        count = math.ceil(float_round(quantity / max_batch_size, precision_digits=6))
+        # Lots are whole units of the UoM rounding: never more lots than units
+        units = math.floor(float_round(quantity / rounding, precision_digits=6))
+        count = min(count, max(units, 1))
+        if count == 1:
+            return [quantity]
+        # Spread the units, the first lots taking one unit more when they do
+        # not divide evenly; the last lot takes what is left, so the lots
+        # always add up to the quantity
+        base, extra = divmod(units, count)
+        lots = [
+            float_round((base + 1 if index < extra else base) * rounding, precision_rounding=rounding)
+            for index in range(count - 1)
+        ]
+        lots.append(float_round(quantity - sum(lots), precision_digits=6))
+        return lots
+    
+    @api.model
+    def _format_lot_split(self, quantity, limit, rounding):
+        if not limit or not limit[0]:
+            return ''
+        lots = self._split_lots(quantity, limit[0], rounding)
+        if len(lots) == 1:
+            return ''
+        return _("    → %d lots of %.2f (max %.2f, %s)\n") % (len(lots), lots[0], limit[0], limit[1])
+    
+    def _split_production_vals(self, vals_list):
+        """Split the production values above their max batch size in lots"""
+        Bom = self.env['mrp.bom']
+        products = self.env['product.product'].browse([vals['product_id'] for vals in vals_list])
+        # The main product order gets its BOM from the standard lookup
+        found = Bom._bom_find(
+            products.browse([vals['product_id'] for vals in vals_list if not vals.get('bom_id')]),
+            company_id=self.env.company.id,
+        )
+        product_boms = []
+        for vals in vals_list:
+            product = products.browse(vals['product_id'])
+            bom = Bom.browse(vals['bom_id']) if vals.get('bom_id') else found.get(product, Bom)
+            product_boms.append((product, bom))
+        limits = self._get_batch_limits(product_boms)
+        
+        split_vals = []
+        for vals, (product, bom) in zip(vals_list, product_boms):
+            lots = self._split_lots(vals['product_qty'], limits[product.id, bom.id][0], product.uom_id.rounding)
+            for index, lot_qty in enumerate(lots, 1):
+                lot_vals = dict(vals, product_qty=lot_qty)
+                if len(lots) > 1:
+                    lot_vals['origin'] = _('%s (Lot %s/%s)') % (vals['origin'], index, len(lots))
+                split_vals.append(lot_vals)
+        return split_vals
+    
+    def _prepare_component_production_vals(self):
+        """Production order values of the components with a BOM.
+        
+        Quantities already created for the planning are read in one grouped
+        query and every component is validated before anything is created.
+        """
+        self.ensure_one()
+        ratio = self.quantity_to_produce / self.planning_id.quantity if self.planning_id.quantity > 0 else 1
+        components = self.planning_id.component_line_ids.filtered('bom_id')
+        
+        existing_qty = self.planning_id._get_created_quantities(components.component_id)
+        # The main order being created counts as well
+        if self.product_id in components.component_id:
+            existing_qty[self.product_id.id] = existing_qty.get(self.product_id.id, 0.0) + self.quantity_to_produce
+        
+        vals_list = []
+        errors = []
+        for comp in components:
+            # Calculate component quantity based on ratio
+            component_qty = comp.quantity * ratio
+            total_existing = existing_qty.get(comp.component_id.id, 0.0)
+            
+            # Check if we're exceeding the planned quantity for this component
+            if float_compare(
+                total_existing + component_qty, comp.quantity,
+                precision_rounding=comp.component_id.uom_id.rounding,
+            ) > 0:
+                errors.append(_(
+                    '• %s: Planned %s, already created %s, trying to create %s'
+                ) % (comp.component_id.name, comp.quantity, total_existing, component_qty))
+                continue
+            existing_qty[comp.component_id.id] = total_existing + component_qty
+            
+            vals_list.append({
+                'product_id': comp.component_id.id,
+                'product_qty': component_qty,
+                'product_uom_id': comp.component_id.uom_id.id,
+                'bom_id': comp.bom_id.id,
+                'origin': f"{self.planning_id.name} - {comp.component_id.name}",
+                'planning_id': self.planning_id.id,
+                'project_definition_id': self.planning_id.project_id.id,
+            })
+        
+        if errors:
+            raise UserError(_(
+                'Cannot create work orders, this would exceed the planned quantity of:\n\n%s'
+            ) % '\n'.join(errors))
+        return vals_list
+    
+    def _create_orders(self):
+        """Create the production orders and link them to the planning.
+        
+        Orders are created and confirmed by chunks, all in the current
+        transaction: a failing chunk rolls back every order, so a retried
+        job starts again from a clean planning.
+        
+        :return: tuple ``(productions, message, has_shortages)``
+        """
+        self.ensure_one()
+        
+        # Concurrent wizards on the same planning wait here, so the checks
+        # below always see the orders created by the others
+        self.planning_id._lock_for_production()
+        self._check_remaining_quantity()
+        
+        # Main product production order
+        production_vals = [{
+            'product_id': self.product_id.id,
+            'product_qty': self.quantity_to_produce,
+            'product_uom_id': self.product_id.uom_id.id,
+            'origin': self.planning_id.name,
+            'planning_id': self.planning_id.id,
+            'project_definition_id': self.planning_id.project_id.id,
+        }]
+        
+        # Component production orders if requested
+        if self.create_component_orders:
+            production_vals += self._prepare_component_production_vals()
+        
+        # Orders above the batch capacity become balanced lots
+        if self.split_lots:
+            production_vals = self._split_production_vals(production_vals)
+        
+        productions = self.env['mrp.production']
+        for start in range(0, len(production_vals), PRODUCTION_CHUNK_SIZE):
+            # Orders of a chunk are created, then confirmed, in one batch
+            chunk = self.env['mrp.production'].create(production_vals[start:start + PRODUCTION_CHUNK_SIZE])
+            if self.confirm_orders:
+                chunk.action_confirm()
+            
+            # Link productions to planning
+            self.planning_id.write({
+                'production_order_ids': [(4, pid) for pid in chunk.ids],
+                'state': 'work_orders_created'
+            })
+            productions |= chunk
+            self.env['planning.job']._report_progress(len(productions), len(production_vals))
+        
+        # Prepare success message
+        message = _('%s work orders created successfully!') % len(productions)
+        
+        shortages = self.planning_id.material_requirement_ids.filtered(
+            lambda l: l.shortage_qty > 0
+        )
+        if shortages:
+            message += _('\n\n⚠️ Note: %s materials have shortages.\n'
+                        'You can create RFQs from Material Planning screen.') % len(shortages)
+        return productions, message, bool(shortages)
+    
+    def _check_remaining_quantity(self):
+        """Check the main product quantity against the orders in the database,
+        ``max_quantity`` being read when the wizard was opened"""
+        self.ensure_one()
+        planning = self.planning_id
+        created = planning._get_created_quantities(self.product_id).get(self.product_id.id, 0.0)
+        remaining = max(0.0, planning.quantity - created)
+        if float_compare(self.quantity_to_produce, remaining, precision_rounding=self.product_id.uom_id.rounding) > 0:
+            raise UserError(_(
+                'Cannot produce %s units!\n'
+                'Planned Quantity: %s\n'
+                'Already Created: %s\n'
+                'Remaining: %s'
+            ) % (self.quantity_to_produce, planning.quantity, created, remaining))
+    
+    def _get_job_values(self):
+        self.ensure_one()
+        return {
+            'planning_id': self.planning_id.id,
+            'product_id': self.product_id.id,
+            'max_quantity': self.max_quantity,
+            'quantity_to_produce': self.quantity_to_produce,
+            'create_component_orders': self.create_component_orders,
+            'confirm_orders': self.confirm_orders,
+            'split_lots': self.split_lots,
+            'ignore_material_shortage': True,
+        }
+    
+    @api.model
+    def _job_create_orders(self, values):
+        """Background job entry point: the wizard is recreated from ``values``
+        since the original one may have been vacuumed in the meantime"""
+        productions, message, has_shortages = self.create(values)._create_orders()
+        return {'params': {'message': message}}
+    
     @api.constrains('quantity_to_produce')
     def _check_quantity(self):
         for wizard in self:
@@ -173,67 +466,17 @@ class WorkOrderCreationWizard(models.TransientModel):
                     'or create RFQs for missing materials first.'
                 ) % shortage_list)
         
-        production_ids = []
-        
-        # Create main product production order
-        main_production = self.env['mrp.production'].create({
-            'product_id': self.product_id.id,
-            'product_qty': self.quantity_to_produce,
-            'product_uom_id': self.product_id.uom_id.id,
-            'origin': self.planning_id.name,
-        })
-        production_ids.append(main_production.id)
-        
-        # Create component production orders if requested
-        if self.create_component_orders:
-            ratio = self.quantity_to_produce / self.planning_id.quantity if self.planning_id.quantity > 0 else 1
-            
-            for comp in self.planning_id.component_line_ids:
-                if comp.bom_id:
-                    # Calculate component quantity based on ratio
-                    component_qty = comp.quantity * ratio
-                    
-                    # Validate component quantity against what's already been produced
-                    existing_productions = self.env['mrp.production'].search([
-                        ('origin', 'like', self.planning_id.name),
-                        ('product_id', '=', comp.component_id.id),
-                    ])
-                    total_existing = sum(existing_productions.mapped('product_qty'))
-                    
-                    # Check if we're exceeding the planned quantity for this component
-                    if total_existing + component_qty > comp.quantity:
-                        raise UserError(_(
-                            'Cannot create work order for %s!\n'
-                            'Planned: %s\n'
-                            'Already created: %s\n'
-                            'Trying to create: %s\n'
-                            'This would exceed planned quantity!'
-                        ) % (comp.component_id.name, comp.quantity, total_existing, component_qty))
-                    
-                    comp_production = self.env['mrp.production'].create({
-                        'product_id': comp.component_id.id,
-                        'product_qty': component_qty,
-                        'product_uom_id': comp.component_id.uom_id.id,
-                        'bom_id': comp.bom_id.id,
-                        'origin': f"{self.planning_id.name} - {comp.component_id.name}",
-                    })
-                    production_ids.append(comp_production.id)
-        
-        # Link productions to planning
-        self.planning_id.write({
-            'production_order_ids': [(4, pid) for pid in production_ids],
-            'state': 'work_orders_created'
-        })
-        
-        # Prepare success message
-        message = _('%s work orders created successfully!') % len(production_ids)
+        if self.run_in_background:
+            job = self.env['planning.job']._enqueue(
+                self.browse(),
+                '_job_create_orders',
+                _('Create Work Orders: %s') % self.planning_id.name,
+                values=self._get_job_values(),
+            )
+            return self.env['planning.job']._notify_queued(job)
         
-        shortages = self.planning_id.material_requirement_ids.filtered(
-            lambda l: l.shortage_qty > 0
-        )
-        if shortages:
-            message += _('\n\n⚠️ Note: %s materials have shortages.\n'
-                        'You can create RFQs from Material Planning screen.') % len(shortages)
+        productions, message, has_shortages = self._create_orders()
+        production_ids = productions.ids
         
         # Show notification
         self.env['bus.bus']._sendone(
@@ -242,7 +485,7 @@ class WorkOrderCreationWizard(models.TransientModel):
             {
                 'title': _('Work Orders Created'),
                 'message': message,
-                'type': 'success' if not shortages else 'warning',
+                'type': 'success' if not has_shortages else 'warning',
                 'sticky': True,
             }
         )